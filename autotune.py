@@ -0,0 +1,119 @@
+import time
+import logging
+from statistics import median
+
+from capture import CAPTURE_BACKENDS, create_capture
+
+TUNED_BACKENDS = ('mss', 'pyautogui')
+
+
+def readings_agree(first, second, tolerance):
+    return all((a is None and b is None) or (a is not None and b is not None and abs(a - b) <= tolerance)
+               for a, b in zip(first, second))
+
+
+class AutoTuner:
+    # Times every capture backend and estimator variant on the configured ROI and picks the
+    # fastest ones whose HP readings agree with the reference: full detection on every frame.
+    def __init__(self, area, use_party_hp_bar=False, detector_factory=None, backends=TUNED_BACKENDS,
+                 frames=15, interval=0.02, tolerance=1.0, capture_factory=create_capture, sleep=time.sleep):
+        self.area = area
+        self.use_party_hp_bar = use_party_hp_bar
+        self.detector_factory = detector_factory
+        self.backends = [name for name in backends if name in CAPTURE_BACKENDS]
+        self.frames = frames
+        self.interval = interval
+        self.tolerance = tolerance
+        self.capture_factory = capture_factory
+        self.sleep = sleep
+
+    def create_estimator(self, skip_unchanged):
+        from hp_detector import HPEstimator
+        detector = self.detector_factory() if self.detector_factory else None
+        return HPEstimator(self.use_party_hp_bar, skip_unchanged, detector)
+
+    def check_size(self, frame):
+        height, width = frame.shape[:2]
+        if (width, height) != (self.area['width'], self.area['height']):
+            raise ValueError(f"captured {width}x{height} instead of {self.area['width']}x{self.area['height']}")
+
+    def open_backends(self):
+        backends = {}
+        for name in self.backends:
+            try:
+                backend = self.capture_factory(name)
+                self.check_size(backend.grab(self.area))  # first grabs pay for imports and handles
+                backends[name] = backend
+            except Exception as e:
+                logging.info(f"Auto-tune: {name} capture unavailable: {e}")
+        return backends
+
+    def capture_rounds(self):
+        # Each round grabs from every backend back to back, alternating the order, so frame i
+        # of every backend shows the same moment and an HP change cannot reject a backend.
+        backends = self.open_backends()
+        times = {name: [] for name in backends}
+        frames = {name: [] for name in backends}
+        order = list(backends)
+        try:
+            for _ in range(self.frames):
+                for name in list(order):
+                    start = time.perf_counter()
+                    try:
+                        frame = backends[name].grab(self.area)
+                    except Exception as e:
+                        logging.info(f"Auto-tune: {name} capture failed: {e}")
+                        order.remove(name)
+                        continue
+                    times[name].append(time.perf_counter() - start)
+                    frames[name].append(frame)
+                order.reverse()
+                self.sleep(self.interval)
+        finally:
+            for backend in backends.values():
+                backend.close()
+        complete = [name for name in self.backends if name in order]
+        return {name: times[name] for name in complete}, {name: frames[name] for name in complete}
+
+    def time_estimator(self, skip_unchanged, frames):
+        estimator = self.create_estimator(skip_unchanged)
+        times = []
+        readings = []
+        for frame in frames:
+            start = time.perf_counter()
+            readings.append(estimator.estimate(frame))
+            times.append(time.perf_counter() - start)
+        return times, readings
+
+    def run(self):
+        times, frames = self.capture_rounds()
+        if not frames:
+            logging.warning("Auto-tune: no capture backend worked.")
+            return None
+        timings = {f"capture_{name}_ms": median(times[name]) * 1000 for name in frames}
+        readings = {name: self.time_estimator(False, frames[name])[1] for name in frames}
+
+        # The first backend in preference order is the reference the others must agree with.
+        reference = readings[next(iter(frames))]
+        correct = [name for name in frames if readings_agree(readings[name], reference, self.tolerance)]
+        capture_backend = min(correct, key=lambda name: timings[f"capture_{name}_ms"])
+
+        reference = readings[capture_backend]
+        estimators = {}
+        for skip_unchanged in (False, True):
+            estimate_times, estimates = self.time_estimator(skip_unchanged, frames[capture_backend])
+            timings[f"estimate_{'skip_unchanged' if skip_unchanged else 'full'}_ms"] = median(estimate_times) * 1000
+            if readings_agree(estimates, reference, self.tolerance):
+                estimators[skip_unchanged] = median(estimate_times)
+        skip_unchanged = min(estimators, key=estimators.get) if estimators else False
+
+        result = {
+            "capture_backend": capture_backend,
+            "skip_unchanged": skip_unchanged,
+            "timings": timings,
+            "area": [self.area['width'], self.area['height']],
+            "reading": reference[-1],
+        }
+        logging.info(f"Auto-tune picked {capture_backend} capture, "
+                     f"{'skip-unchanged' if skip_unchanged else 'full'} estimation: {timings}")
+        return result
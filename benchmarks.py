@@ -0,0 +1,254 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import tracemalloc
+
+
+def measure(fn, iterations):
+    # Timed without tracemalloc, which slows every allocation; the peak comes from a second pass.
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for _ in range(iterations):
+        fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"us_per_frame": elapsed / iterations * 1e6, "peak_bytes": peak}
+
+
+def bench_frame_ingestion(width=400, height=120, iterations=500):
+    import numpy as np
+    from mss.screenshot import ScreenShot
+    from capture import frame_from_screenshot
+
+    monitor = {"left": 0, "top": 0, "width": width, "height": height}
+    shot = ScreenShot(bytearray(width * height * 4), monitor)
+
+    legacy = measure(lambda: np.array(shot), iterations)
+    legacy["bytes_copied"] = np.array(shot).nbytes
+
+    frame = frame_from_screenshot(shot)
+    zero_copy = measure(lambda: frame_from_screenshot(shot), iterations)
+    zero_copy["bytes_copied"] = 0 if np.shares_memory(frame.pixels, np.frombuffer(shot.raw, dtype=np.uint8)) else frame.pixels.nbytes
+
+    return {"frame": f"{width}x{height}", "legacy_np_array": legacy, "zero_copy_view": zero_copy}
+
+
+def percentiles(values, points=(50, 95, 99)):
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    result = {f"p{p}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points}
+    result["max"] = ordered[-1]
+    return result
+
+
+def timer_lateness(duration, period):
+    # Mimics a KeyPresser scheduler thread and records how late each wake-up is.
+    lateness = []
+    start = time.perf_counter()
+    deadline = start + period
+    while deadline - start < duration:
+        remaining = deadline - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        lateness.append((time.perf_counter() - deadline) * 1000)
+        deadline += period
+    return lateness
+
+
+def bench_input_jitter(duration=5.0, period=0.01, width=1280, height=720):
+    import threading
+    from capture import SyntheticCapture
+    from hp_detector import HPEstimator
+    from vision_worker import VisionProcess
+
+    area = {"left": 0, "top": 0, "width": width, "height": height}
+    results = {}
+
+    stop = threading.Event()
+    samples = [0]
+
+    def vision_thread():
+        capture = SyntheticCapture()
+        estimator = HPEstimator(skip_unchanged=False)
+        while not stop.is_set():
+            estimator.estimate(capture.grab(area))
+            samples[0] += 1
+
+    worker = threading.Thread(target=vision_thread, daemon=True)
+    worker.start()
+    lateness = timer_lateness(duration, period)
+    stop.set()
+    worker.join()
+    results["thread"] = {"lateness_ms": percentiles(lateness), "vision_samples": samples[0]}
+
+    process = VisionProcess(area, skip_unchanged=False, capture='synthetic', interval=0.0)
+    process.start()
+    stop.clear()
+    samples[0] = 0
+
+    def consume():
+        while not stop.is_set():
+            if process.receive(timeout=0.1) is not None:
+                samples[0] += 1
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    lateness = timer_lateness(duration, period)
+    stop.set()
+    consumer.join()
+    process.stop()
+    results["process"] = {"lateness_ms": percentiles(lateness), "vision_samples": samples[0]}
+
+    return {"frame": f"{width}x{height}", "period_ms": period * 1000, **results}
+
+
+def bench_gauges(iterations=2000, width=1280, height=720, total_pixels=1200):
+    # Same total scanline pixels split across more gauges; cost should stay roughly flat.
+    import numpy as np
+    from capture import Frame
+    from gauge_engine import Gauge, GaugeEngine
+
+    frame = Frame(np.full((height, width, 4), 90, dtype=np.uint8))
+    results = {}
+    for count in (1, 4, 8, 16):
+        bar_width = total_pixels // count
+        gauges = [Gauge(f"gauge_{i}", {"left": 0, "top": i * 20 + 10, "width": bar_width, "height": 8})
+                  for i in range(count)]
+        engine = GaugeEngine(gauges)
+        stats = measure(lambda: engine.evaluate(frame), iterations)
+        stats["scanline_pixels"] = int(engine.widths.sum())
+        results[f"{count}_gauges"] = stats
+    return results
+
+
+def bench_preview(iterations=2000, width=400, height=120):
+    # Per-update cost of the GUI's live ROI preview at the default texture size.
+    from array import array
+    from capture import SyntheticCapture
+    from roi_preview import ROIPreview
+
+    frame = SyntheticCapture().grab({"left": 0, "top": 0, "width": width, "height": height})
+    preview = ROIPreview(buffer=array('f', bytes(220 * 48 * 16)))
+    rect = ((width - 70) // 2, (height - 8) // 2, 70, 8)
+    stats = measure(lambda: preview.update(frame.pixels, rect), iterations)
+    stats["texture"] = f"{preview.width}x{preview.height}"
+    return stats
+
+
+def rate(times):
+    # Intervals over the time they span; counting presses over the run would include the one at t=0.
+    if len(times) < 2:
+        return 0.0
+    return (len(times) - 1) / (times[-1] - times[0])
+
+
+def bench_key_presser(duration=1.0, key_counts=(1, 2, 4), periods=(0.01, 0.05, 0.2)):
+    # Drives KeyPresser against the recording backend in real time and compares
+    # achieved against configured key rates, for sequential and batched dispatch.
+    from input_backend import RecordingBackend
+    from key_presser import KeyPresser
+    from simulation import SimulationConfig
+    from thread_cpu import thread_cpu_times
+
+    results = {}
+    for batched in (False, True):
+        for count in key_counts:
+            for period in periods:
+                overrides = {"monitor_hp": False, "left_click_var": False, "right_click_var": False,
+                             "hold_shift_key": False}
+                for i in range(4):
+                    overrides[f"key_to_press_{i}"] = str(i + 1) if i < count else ""
+                    overrides[f"frequency_{i}"] = period
+                config = SimulationConfig(overrides)
+                backend = RecordingBackend()
+                backend.batched = batched
+                presser = KeyPresser(config.config, config, input_backend=backend)
+
+                samples = []
+                presser.start_pressing()
+                start = time.perf_counter()
+                while time.perf_counter() - start < duration:
+                    samples.append((round((time.perf_counter() - start) * 1000, 1), presser.key_press_queue.qsize()))
+                    time.sleep(0.05)
+                # Only this presser's threads; ones left over from earlier runs would share their names.
+                cpu = thread_cpu_times(presser.threads)
+                presser.stop_pressing()
+                depths = [depth for _, depth in samples]
+
+                presses = {}
+                for timestamp, kind, key in backend.events:
+                    if kind == 'key_down':
+                        presses.setdefault(key, []).append(timestamp)
+                deviations = [abs(later - earlier - period) * 1000
+                              for times in presses.values() for earlier, later in zip(times, times[1:])]
+                name = f"{'batched' if batched else 'sequential'}_{count}keys_{int(period * 1000)}ms"
+                results[name] = {
+                    "configured_actions_per_s": count / period,
+                    "actions_per_s": sum(rate(times) for times in presses.values()),
+                    "jitter_ms": percentiles(deviations),
+                    "queue_depth": {"mean": sum(depths) / len(depths), "max": max(depths), "final": depths[-1],
+                                    "samples_ms": samples},
+                    "worst_queue_delay_ms": presser.max_queue_delay * 1000,
+                    "cpu_s": cpu,
+                }
+    return results
+
+
+def bench_rotation(iterations=20000):
+    # One scheduling decision (ready + mark) for growing rotations; cost should stay flat.
+    from rotation import Rotation
+
+    results = {}
+    for count in (4, 16, 64):
+        actions = [{"key": f"k{i}", "cooldown": 0.5 + i * 0.01, "priority": i % 4,
+                    "min_hp": 40 if i % 3 == 0 else None, "after": "k0" if i % 5 == 4 else None}
+                   for i in range(count)]
+        rotation = Rotation(actions)
+        clock = iter(range(10 ** 9))
+
+        def decide():
+            now = next(clock) * 0.05
+            for index in rotation.ready(now, 75.0):
+                rotation.mark(index, now)
+
+        results[f"{count}_actions"] = measure(decide, iterations)
+    return results
+
+
+BENCHMARKS = {
+    "frame-ingestion": bench_frame_ingestion,
+    "gauges": bench_gauges,
+    "input-jitter": bench_input_jitter,
+    "key-presser": bench_key_presser,
+    "rotation": bench_rotation,
+    "preview": bench_preview,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ZXOneButton benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS) + ["all"])
+    parser.add_argument("--output", help="Write results as JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    names = sorted(BENCHMARKS) if args.benchmark == "all" else [args.benchmark]
+    results = {name: BENCHMARKS[name]() for name in names}
+    text = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
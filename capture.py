@@ -0,0 +1,118 @@
+import math
+import time
+import threading
+import numpy as np
+import cv2
+
+
+class Frame:
+    # Read-only view over a capture buffer plus the channel order it was captured in.
+    hsv_codes = {
+        'BGRA': cv2.COLOR_BGR2HSV,  # BGR2HSV accepts 4-channel input and ignores alpha
+        'BGR': cv2.COLOR_BGR2HSV,
+        'RGB': cv2.COLOR_RGB2HSV,
+    }
+
+    def __init__(self, pixels, order='BGRA', source=None):
+        pixels.flags.writeable = False
+        self.pixels = pixels
+        self.order = order
+        # Keeps the object owning the memory alive for as long as the view is used.
+        self.source = source
+
+    @property
+    def shape(self):
+        return self.pixels.shape
+
+    @property
+    def hsv_code(self):
+        return self.hsv_codes[self.order]
+
+    @property
+    def bgr(self):
+        # Strided views, never copies: drop alpha or reverse RGB in place.
+        if self.order == 'RGB':
+            return self.pixels[:, :, ::-1]
+        return self.pixels[:, :, :3]
+
+
+def frame_from_screenshot(shot):
+    pixels = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+    return Frame(pixels, 'BGRA', shot)
+
+
+def frame_from_image(image):
+    # PIL has no buffer export, so this is the one unavoidable copy on the fallback path.
+    return Frame(np.asarray(image), 'RGB', image)
+
+
+class MssCapture:
+    name = 'mss'
+
+    def __init__(self):
+        self.sct = None
+        self.owner_thread = None
+
+    def grab(self, area):
+        # mss handles are bound to the thread that created them.
+        if self.sct is None or self.owner_thread != threading.get_ident():
+            from mss import mss
+            self.close()
+            self.sct = mss()
+            self.owner_thread = threading.get_ident()
+        return frame_from_screenshot(self.sct.grab(area))
+
+    def close(self):
+        if self.sct is not None:
+            try:
+                self.sct.close()
+            except Exception:
+                pass
+            self.sct = None
+
+
+class PyAutoGUICapture:
+    name = 'pyautogui'
+
+    def grab(self, area):
+        import pyautogui
+        image = pyautogui.screenshot(region=(area['left'], area['top'], area['width'], area['height']))
+        return frame_from_image(image)
+
+    def close(self):
+        pass
+
+
+class SyntheticCapture:
+    # Draws a regular HP bar into a grey frame; used by benchmarks and headless runs.
+    name = 'synthetic'
+
+    def __init__(self, hp_source=None, bar_width=70, bar_height=8):
+        self.hp_source = hp_source or (lambda: 50 + 45 * math.sin(time.perf_counter()))
+        self.bar_width = bar_width
+        self.bar_height = bar_height
+
+    def grab(self, area):
+        height, width = area['height'], area['width']
+        pixels = np.full((height, width, 4), 90, dtype=np.uint8)
+        x = (width - self.bar_width) // 2
+        y = (height - self.bar_height) // 2
+        hp = min(max(self.hp_source(), 0.0), 100.0)
+        filled = int(round(hp / 100 * (self.bar_width - 2)))
+        pixels[y:y+self.bar_height, x:x+self.bar_width] = (0, 0, 0, 255)
+        pixels[y:y+self.bar_height, x:x+filled] = (255, 80, 40, 255)
+        return Frame(pixels, 'BGRA')
+
+    def close(self):
+        pass
+
+
+CAPTURE_BACKENDS = {
+    MssCapture.name: MssCapture,
+    PyAutoGUICapture.name: PyAutoGUICapture,
+    SyntheticCapture.name: SyntheticCapture,
+}
+
+
+def create_capture(name):
+    return CAPTURE_BACKENDS[name]()
@@ -0,0 +1,126 @@
+import time
+import threading
+from queue import Empty
+
+
+class RealClock:
+    # Wall-clock timing. sleep_until polls its condition every poll_interval so
+    # loops stop promptly, like the original 10 ms sleep loops.
+    poll_interval = 0.01
+
+    def now(self):
+        return time.perf_counter()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def sleep_until(self, deadline, keep_going=None):
+        while keep_going is None or keep_going():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, self.poll_interval))
+
+    def wait(self, event, timeout):
+        return event.wait(timeout)
+
+    def get(self, queue, timeout):
+        return queue.get(timeout=timeout)
+
+    def join(self, thread, timeout=None):
+        thread.join(timeout)
+
+    def notify(self):
+        pass
+
+    def thread(self, target, *args, name=None, daemon=False):
+        return threading.Thread(target=target, args=args, name=name, daemon=daemon)
+
+
+class VirtualClock:
+    # Simulated time for a set of participating threads. Time stands still while any
+    # participant is running and jumps to the earliest deadline once all of them are
+    # blocked in the clock, so hours of scheduling run as fast as the work allows.
+    # Participants must only block through the clock (sleep/wait/get/join); anything
+    # that changes what a waiter is waiting for should call notify().
+    def __init__(self, start=0.0):
+        self.time = start
+        self.condition = threading.Condition()
+        self.participants = 0
+        self.deadlines = {}
+
+    def now(self):
+        return self.time
+
+    def register(self):
+        with self.condition:
+            self.participants += 1
+
+    def unregister(self):
+        with self.condition:
+            self.participants -= 1
+            self.wake_all()
+
+    def thread(self, target, *args, name=None, daemon=False):
+        # Registered before start so time cannot advance before the thread first runs.
+        self.register()
+        return threading.Thread(target=self.run, args=(target,) + args, name=name, daemon=daemon)
+
+    def run(self, target, *args):
+        try:
+            target(*args)
+        finally:
+            self.unregister()
+
+    def wake_all(self):
+        # Every waiter re-checks its condition and re-registers its deadline before
+        # time may move again.
+        self.deadlines.clear()
+        self.condition.notify_all()
+
+    def advance(self):
+        if self.deadlines and len(self.deadlines) >= self.participants:
+            self.time = max(self.time, min(self.deadlines.values()))
+            self.wake_all()
+            return True
+        return False
+
+    def wait_for(self, predicate, timeout):
+        ident = threading.get_ident()
+        with self.condition:
+            deadline = self.time + timeout
+            while True:
+                result = predicate()
+                if result or self.time >= deadline:
+                    self.deadlines.pop(ident, None)
+                    return result
+                self.deadlines[ident] = deadline
+                if not self.advance():
+                    self.condition.wait()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.wait_for(lambda: False, seconds)
+
+    def sleep_until(self, deadline, keep_going=None):
+        stop = (lambda: not keep_going()) if keep_going else (lambda: False)
+        self.wait_for(stop, deadline - self.time)
+
+    def wait(self, event, timeout):
+        return self.wait_for(event.is_set, timeout)
+
+    def get(self, queue, timeout):
+        if not self.wait_for(lambda: not queue.empty(), timeout):
+            raise Empty
+        return queue.get_nowait()
+
+    def join(self, thread, timeout=None):
+        self.wait_for(lambda: not thread.is_alive(), 1e9 if timeout is None else timeout)
+
+    def notify(self):
+        with self.condition:
+            self.wake_all()
+
+
+REAL_CLOCK = RealClock()
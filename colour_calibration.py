@@ -0,0 +1,112 @@
+import logging
+import numpy as np
+import cv2
+
+from hp_detector import COLOUR_RANGES, frame_pixels
+
+# Hue centre of each class the calibrator may assign a regular bar's fill to.
+FILL_HUES = {"blue": 120, "yellow": 30}
+
+
+def hue_distance(a, b):
+    d = abs(a - b) % 180
+    return min(d, 180 - d)
+
+
+def hue_clusters(hues, min_share=0.05, bin_share=0.005):
+    # Runs of occupied bins in the circular hue histogram; a run that wraps past 179
+    # is split in two so each part can be expressed as a plain (lower, upper) range.
+    histogram = np.bincount(hues, minlength=180)[:180]
+    occupied = histogram > max(1, bin_share * len(hues))
+    if occupied.all():
+        return [(0, 179)]
+    start = int(np.argmin(occupied))  # begin the scan on an empty bin
+    clusters = []
+    run = None
+    for offset in range(1, 181):
+        h = (start + offset) % 180
+        if occupied[h] and run is None:
+            run = [h, h]
+        elif occupied[h]:
+            run[1] = h
+        elif run is not None:
+            clusters.append(run)
+            run = None
+    ranges = []
+    for low, high in clusters:
+        parts = [(low, high)] if low <= high else [(low, 179), (0, high)]
+        count = sum(histogram[a:b + 1].sum() for a, b in parts)
+        if count >= min_share * len(hues):
+            ranges.extend(parts)
+    return ranges
+
+
+class ColourCalibrator:
+    # Learns HSV ranges for the bar colours from frames where the bar's rect is known.
+    def __init__(self, base_ranges=None, margin=(4, 25, 25), percentiles=(2, 98)):
+        self.base_ranges = base_ranges or COLOUR_RANGES
+        self.margin = margin
+        self.percentiles = percentiles
+        self.samples = {}
+
+    def add_sample(self, frame, rect, colour):
+        pixels = self.rect_hsv(frame, rect).reshape(-1, 3)
+        self.samples.setdefault(colour, []).append(pixels)
+
+    def rect_hsv(self, frame, rect):
+        pixels, code = frame_pixels(frame)
+        x, y, w, h = rect
+        return cv2.cvtColor(np.ascontiguousarray(pixels[y:y+h, x:x+w]), code)
+
+    def add_bar(self, frame, rect, party=False):
+        # Splits the bar into fill and empty pixels with Otsu's threshold on value,
+        # then assigns the fill to the nearest-hued class.
+        hsv = self.rect_hsv(frame, rect).reshape(-1, 3)
+        if party:
+            # Party bars are detected from their red fill alone.
+            self.samples.setdefault("red", []).append(hsv)
+            return "red"
+        threshold, _ = cv2.threshold(hsv[:, 2].reshape(1, -1), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        fill = hsv[hsv[:, 2] > threshold]
+        empty = hsv[hsv[:, 2] <= threshold]
+        if len(empty):
+            self.samples.setdefault("black", []).append(empty)
+        if not len(fill):
+            return None
+        median_hue = int(np.median(fill[:, 0]))
+        colour = min(("blue", "yellow"), key=lambda name: hue_distance(median_hue, FILL_HUES[name]))
+        self.samples.setdefault(colour, []).append(fill)
+        return colour
+
+    def fit_class(self, pixels):
+        margin_h, margin_s, margin_v = self.margin
+        low_p, high_p = self.percentiles
+        ranges = []
+        for hue_low, hue_high in hue_clusters(pixels[:, 0]):
+            members = pixels[(pixels[:, 0] >= hue_low) & (pixels[:, 0] <= hue_high)]
+            s_low, s_high = np.percentile(members[:, 1], (low_p, high_p))
+            v_low, v_high = np.percentile(members[:, 2], (low_p, high_p))
+            ranges.append([
+                [max(0, hue_low - margin_h), int(max(0, s_low - margin_s)), int(max(0, v_low - margin_v))],
+                [min(179, hue_high + margin_h), int(min(255, s_high + margin_s)), int(min(255, v_high + margin_v))]
+            ])
+        return ranges
+
+    def fit(self):
+        colour_ranges = {name: [list(map(list, r)) for r in ranges] for name, ranges in self.base_ranges.items()}
+        for colour, chunks in self.samples.items():
+            pixels = np.concatenate(chunks)
+            if colour == "black":
+                # Only the brightness ceiling matters for the empty part of the bar.
+                v_high = np.percentile(pixels[:, 2], self.percentiles[1]) + self.margin[2]
+                colour_ranges["black"] = [[[0, 0, 0], [180, 255, int(min(255, v_high))]]]
+                continue
+            ranges = self.fit_class(pixels)
+            if not ranges:
+                continue
+            colour_ranges[colour] = ranges
+            if colour == "blue":
+                # The detection mask also accepts darker blue than the scanline count.
+                colour_ranges["blue_bar"] = [[low[:2] + [max(0, low[2] - 50)], high] for low, high in ranges]
+            logging.info(f"Calibrated {colour}: {ranges}")
+        return colour_ranges
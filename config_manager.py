@@ -1,6 +1,7 @@
 import json
 import os
 from functools import lru_cache
+from metrics import REGISTRY
 
 class ConfigManager:
     def __init__(self):
@@ -25,9 +26,37 @@ class ConfigManager:
             "monitor_hp": True,
             "monitor_diablo_window": True,
             "hold_shift_key": False,
-            "use_party_hp_bar": False
+            "use_party_hp_bar": False,
+            "save_hp_bar_images": True,
+            "hp_image_interval": 1.0,
+            "hp_image_max_files": 200,
+            "hp_image_max_mb": 50,
+            "record_session": False,
+            "render_fps": 60,
+            "idle_render_fps": 5,
+            "skip_unchanged_frames": True,
+            "vision_process_mode": False,
+            "display_calibration": {},
+            "gauges": [],
+            "potion_confirm_window": 0.6,
+            "potion_max_retries": 1,
+            "preview_fps": 5,
+            "input_backend": "pynput",
+            "max_log_lines": 200,
+            "profiler_enabled": False,
+            "profiler_window": 10.0,
+            "metrics_port": 0,
+            "metrics_textfile": "",
+            "metrics_interval": 15.0,
+            "daemon_address": "",
+            "daemon_authkey": "",
+            "rotation": [],
+            "auto_tune": True
         }
         self.is_dirty = False
+        self.saves_metric = REGISTRY.counter("config_saves", "Times config.json was written.")
+        REGISTRY.gauge("config_cache_misses", "Config lookups that missed the get() cache.",
+                       lambda: self.get.cache_info().misses)
         self.load_config()
 
     def load_config(self):
@@ -50,6 +79,7 @@ class ConfigManager:
         if self.is_dirty:
             with open('config.json', 'w') as f:
                 json.dump(self.config, f, indent=4)
+            self.saves_metric.inc()
             self.is_dirty = False
 
     def update_config(self, new_config):
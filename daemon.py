@@ -0,0 +1,383 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from multiprocessing.connection import Listener, Client
+
+from config_manager import ConfigManager
+from key_presser import KeyPresser
+from hp_monitor import HPMonitor
+from metrics import start_metrics_export
+from display_geometry import display_scaling_factor
+
+
+def default_address():
+    # A named pipe on Windows, a Unix socket elsewhere; both are local to this machine.
+    if sys.platform == 'win32':
+        return r'\\.\pipe\zxonebutton'
+    return os.path.join(tempfile.gettempdir(), 'zxonebutton.sock')
+
+
+def control_address(config_manager=None):
+    address = config_manager.get('daemon_address', '') if config_manager else ''
+    return address or default_address()
+
+
+def control_authkey(config_manager=None):
+    authkey = config_manager.get('daemon_authkey', '') if config_manager else ''
+    return authkey.encode('utf-8') if authkey else None
+
+
+def coerce_setting(key, value, default):
+    # Values arrive as JSON; they must match the type of the setting's default.
+    if default is None:
+        return value
+    if isinstance(default, bool):
+        if isinstance(value, bool):
+            return value
+    elif isinstance(default, (int, float)):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if isinstance(default, float):
+                return float(value)
+            if value == int(value):
+                return int(value)
+    elif isinstance(value, type(default)):
+        return value
+    raise ValueError(f"Setting {key} expects {type(default).__name__}, got {json.dumps(value)}")
+
+
+class ControlClient:
+    # One connection to the daemon. Replies and events are JSON messages; sends are
+    # locked because the status thread streams events on the same connection.
+    def __init__(self, connection, number):
+        self.connection = connection
+        self.number = number
+        self.subscribed = False
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            self.connection.send_bytes(json.dumps(message).encode('utf-8'))
+
+    def receive(self):
+        return json.loads(self.connection.recv_bytes().decode('utf-8'))
+
+
+class HeadlessDaemon:
+    # Runs KeyPresser and HPMonitor without DearPyGui, controlled over a local socket.
+    # Each message is one command or a list of commands run in order; config changes in a
+    # batch are applied once at the end, so a batch restarts the presser at most once.
+    def __init__(self, config_manager=None, key_presser=None, hp_monitor=None, address=None, authkey=None,
+                 status_interval=1.0, input_hooks=None, window_watcher=None):
+        self.config_manager = config_manager or ConfigManager()
+        if key_presser is None:
+            if input_hooks is None:
+                try:
+                    from input_hooks import InputHookService
+                    input_hooks = InputHookService()
+                except ImportError as e:
+                    # No desktop session; everything but the F3 hotkey still works.
+                    logging.error(f"Keyboard hooks unavailable, running without the F3 hotkey: {e}")
+            key_presser = KeyPresser(self.config_manager.config, self.config_manager, input_hooks=input_hooks)
+        self.key_presser = key_presser
+        self.hp_monitor = hp_monitor or HPMonitor(self.config_manager, self.key_presser, display_scaling_factor())
+        self.input_hooks = input_hooks
+        self.window_watcher = window_watcher
+        self.address = address or control_address(self.config_manager)
+        self.authkey = authkey if authkey is not None else control_authkey(self.config_manager)
+        self.status_interval = status_interval
+        self.listener = None
+        self.clients = []
+        self.clients_lock = threading.Lock()
+        self.stop_requested = threading.Event()
+        self.hotkey_subscription = None
+        self.metrics_exporters = []
+        self.commands = {
+            "start": self.start_tool,
+            "stop": self.stop_tool,
+            "toggle": self.toggle_tool,
+            "status": self.status,
+            "load_profile": self.load_profile,
+            "set_key": self.set_key,
+            "set": self.set_value,
+            "autotune": self.autotune,
+            "subscribe": self.subscribe,
+            "shutdown": self.shutdown,
+        }
+
+    def serve(self, start=False):
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            os.unlink(self.address)  # left behind by a previous run
+        self.listener = Listener(self.address, authkey=self.authkey)
+        logging.info(f"Headless daemon listening on {self.address}")
+        self.metrics_exporters = start_metrics_export(self.config_manager)
+        if self.input_hooks:
+            self.hotkey_subscription = self.input_hooks.subscribe(lambda key, pressed: self.toggle_tool(), ['f3'])
+            self.input_hooks.start()
+        self.setup_window_watcher()
+        if start:
+            self.start_tool()
+        threading.Thread(target=self.stream_status, name="DaemonStatus", daemon=True).start()
+        threading.Thread(target=self.accept_clients, name="DaemonAccept", daemon=True).start()
+        try:
+            while not self.stop_requested.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.cleanup()
+
+    def accept_clients(self):
+        number = 0
+        while not self.stop_requested.is_set():
+            try:
+                connection = self.listener.accept()
+            except Exception as e:
+                if not self.stop_requested.is_set():
+                    logging.error(f"Daemon failed to accept a connection: {e}")
+                continue
+            number += 1
+            client = ControlClient(connection, number)
+            with self.clients_lock:
+                self.clients.append(client)
+            threading.Thread(target=self.serve_client, args=(client,), name=f"DaemonClient-{number}",
+                             daemon=True).start()
+
+    def serve_client(self, client):
+        try:
+            while not self.stop_requested.is_set():
+                try:
+                    message = client.receive()
+                except (EOFError, OSError):
+                    break
+                except ValueError as e:
+                    client.send({"ok": False, "error": f"Invalid JSON: {e}"})
+                    continue
+                client.send(self.execute(message, client))
+        finally:
+            with self.clients_lock:
+                if client in self.clients:
+                    self.clients.remove(client)
+            client.connection.close()
+
+    def execute(self, message, client=None):
+        batch = message if isinstance(message, list) else [message]
+        results = []
+        config_changed = False
+        for command in batch:
+            name = command.get("cmd") if isinstance(command, dict) else None
+            handler = self.commands.get(name)
+            if handler is None:
+                results.append({"ok": False, "error": f"Unknown command: {name}"})
+                continue
+            try:
+                result = handler(command, client) or {}
+            except Exception as e:
+                logging.error(f"Daemon command {name} failed: {e}")
+                results.append({"ok": False, "cmd": name, "error": str(e)})
+                continue
+            if result.pop("config_changed", False):
+                config_changed = True
+            results.append({"ok": True, "cmd": name, **result})
+        if config_changed:
+            self.apply_config()
+        return results if isinstance(message, list) else results[0]
+
+    def apply_config(self):
+        self.key_presser.update_config(self.config_manager.config)
+        self.hp_monitor.update_config(self.config_manager.config)
+        self.broadcast({"event": "config_applied"})
+
+    def start_tool(self, command=None, client=None):
+        if self.key_presser.should_press.is_set():
+            return {"running": True}
+        self.key_presser.start_pressing()
+        if self.config_manager.get('monitor_diablo_window', True) and not self.is_diablo_window_active():
+            self.key_presser.pause()
+        if self.config_manager.get('monitor_hp'):
+            self.hp_monitor.start_monitoring()
+        self.broadcast({"event": "started"})
+        return {"running": True}
+
+    def stop_tool(self, command=None, client=None):
+        if self.key_presser.should_press.is_set():
+            self.key_presser.stop_pressing()
+            self.hp_monitor.stop_monitoring()
+            self.broadcast({"event": "stopped"})
+        return {"running": False}
+
+    def toggle_tool(self, command=None, client=None):
+        if self.key_presser.should_press.is_set():
+            return self.stop_tool()
+        return self.start_tool()
+
+    def status(self, command=None, client=None):
+        return {
+            "running": self.key_presser.should_press.is_set(),
+            "paused": self.key_presser.is_paused.is_set(),
+            "monitoring": self.hp_monitor.should_monitor.is_set(),
+            "hp": self.hp_monitor.last_hp_percentage,
+            "hp_time": self.hp_monitor.last_sample_time,
+            "queue_depth": self.key_presser.key_press_queue.qsize(),
+            "window_active": self.is_diablo_window_active(),
+        }
+
+    def load_profile(self, command, client=None):
+        name = command["name"]
+        if name.endswith('.json'):
+            name = name[:-5]
+        if not name or '/' in name or '\\' in name or '..' in name:
+            raise ValueError(f"Invalid profile name: {name}")
+        if not os.path.exists(os.path.join('profiles', f'{name}.json')):
+            raise ValueError(f"Profile not found: {name}")
+        self.config_manager.load_profile(name)
+        return {"profile": name, "config_changed": True}
+
+    def set_key(self, command, client=None):
+        slot = int(command["slot"])
+        if not 0 <= slot < 4:
+            raise ValueError(f"Key slot must be 0-3, got {slot}")
+        if self.config_manager.get('rotation'):
+            raise ValueError("Key slots are ignored while a rotation is configured; edit 'rotation' instead")
+        self.config_manager.set(f'key_to_press_{slot}', command.get("key", ""))
+        if "frequency" in command:
+            self.config_manager.set(f'frequency_{slot}', float(command["frequency"]))
+        return {"config_changed": True}
+
+    def set_value(self, command, client=None):
+        key = command["key"]
+        if key not in self.config_manager.default_config:
+            raise ValueError(f"Unknown setting: {key}")
+        self.config_manager.set(key, coerce_setting(key, command["value"], self.config_manager.default_config[key]))
+        return {"config_changed": True}
+
+    def autotune(self, command=None, client=None):
+        # Replies at once; subscribers get an "autotune" event with the result.
+        if not self.hp_monitor.request_autotune(on_done=self.autotune_done):
+            raise ValueError("Auto-tune unavailable; select the HP bar area and turn off the vision process")
+        return {"running": True}
+
+    def autotune_done(self, success):
+        calibration = self.hp_monitor.calibration
+        self.broadcast({"event": "autotune", "ok": success, "capture_backend": calibration.get('capture_backend'),
+                        "skip_unchanged": calibration.get('skip_unchanged'),
+                        "timings": calibration.get('autotune_timings')})
+
+    def subscribe(self, command, client=None):
+        if client is None:
+            raise ValueError("Only connected clients can subscribe")
+        client.subscribed = command.get("enabled", True)
+        return {"subscribed": client.subscribed}
+
+    def shutdown(self, command=None, client=None):
+        self.stop_requested.set()
+        return {}
+
+    def broadcast(self, event):
+        with self.clients_lock:
+            subscribers = [client for client in self.clients if client.subscribed]
+        for client in subscribers:
+            try:
+                client.send(event)
+            except OSError:
+                client.subscribed = False
+
+    def stream_status(self):
+        while not self.stop_requested.wait(self.status_interval):
+            self.broadcast({"event": "status", "time": time.time(), **self.status()})
+
+    def setup_window_watcher(self):
+        if self.window_watcher is not None:
+            self.window_watcher.subscribe(self.on_window_focus_changed)
+            self.window_watcher.start()
+            return
+        try:
+            from window_watcher import create_window_watcher
+            self.window_watcher = create_window_watcher("Diablo IV", self.on_window_focus_changed)
+        except Exception as e:
+            logging.error(f"Unable to watch the Diablo IV window: {e}")
+
+    def on_window_focus_changed(self, active):
+        if not self.config_manager.get('monitor_diablo_window', True):
+            return
+        if active:
+            self.key_presser.resume()
+        else:
+            self.key_presser.pause()
+        self.broadcast({"event": "window", "active": active})
+
+    def is_diablo_window_active(self):
+        return self.window_watcher is None or self.window_watcher.is_active
+
+    def cleanup(self):
+        logging.info("Stopping headless daemon...")
+        self.stop_requested.set()
+        self.stop_tool()
+        if self.hotkey_subscription:
+            self.input_hooks.unsubscribe(self.hotkey_subscription)
+        if self.input_hooks:
+            self.input_hooks.stop()
+        if self.window_watcher:
+            self.window_watcher.stop()
+        for exporter in self.metrics_exporters:
+            exporter.stop()
+        if self.listener:
+            self.listener.close()
+        with self.clients_lock:
+            for client in self.clients:
+                client.connection.close()
+        self.config_manager.cleanup()
+
+
+def send_commands(commands, address=None, authkey=None, on_event=None):
+    # Sends one command or a batch and returns the reply. With on_event, the reply and
+    # every streamed event are passed to it until the connection closes.
+    connection = Client(address or default_address(), authkey=authkey)
+    client = ControlClient(connection, 0)
+    try:
+        client.send(commands)
+        reply = client.receive()
+        if on_event:
+            on_event(reply)
+            while True:
+                try:
+                    on_event(client.receive())
+                except (EOFError, OSError):
+                    break
+        return reply
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run ZXOneButton without the GUI, controlled over a local socket")
+    parser.add_argument("--address", help="Named pipe or Unix socket path (default: daemon_address from config)")
+    parser.add_argument("--send", help="Send a JSON command or list of commands to a running daemon and print the reply")
+    parser.add_argument("--follow", action="store_true", help="With --send, keep printing streamed events")
+    parser.add_argument("--start", action="store_true", help="Start pressing as soon as the daemon is up")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.send:
+        config_manager = ConfigManager()
+        commands = json.loads(args.send)
+        if args.follow:
+            commands = (commands if isinstance(commands, list) else [commands]) + [{"cmd": "subscribe"}]
+        address = args.address or control_address(config_manager)
+        authkey = control_authkey(config_manager)
+        if args.follow:
+            send_commands(commands, address, authkey, on_event=lambda message: print(json.dumps(message), flush=True))
+        else:
+            print(json.dumps(send_commands(commands, address, authkey), indent=4))
+        return 0
+
+    HeadlessDaemon(address=args.address).serve(start=args.start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
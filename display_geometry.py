@@ -0,0 +1,83 @@
+import ctypes
+import logging
+
+# Display height the detector's base size gates were measured on.
+REFERENCE_HEIGHT = 1080
+
+
+def primary_display_size():
+    try:
+        user32 = ctypes.windll.user32
+        return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
+    except Exception:
+        pass
+    try:
+        from mss import mss
+        with mss() as sct:
+            monitor = sct.monitors[1]
+            return monitor['width'], monitor['height']
+    except Exception as e:
+        logging.warning(f"Unable to determine display size: {e}")
+        return None
+
+
+def display_scaling_factor():
+    try:
+        user32 = ctypes.windll.user32
+        user32.SetProcessDPIAware()
+        return user32.GetDpiForSystem() / 96.0
+    except Exception as e:
+        logging.warning(f"Failed to get display scaling factor: {e}")
+        return 1.0
+
+
+def display_key(width, height, scaling_factor):
+    return f"{width}x{height}@{scaling_factor:.2f}"
+
+
+class DisplayCalibration:
+    # Per-display calibration entries stored in config under 'display_calibration',
+    # keyed by resolution and DPI scaling factor.
+    def __init__(self, config_manager, scaling_factor, size=None):
+        self.config_manager = config_manager
+        self.scaling_factor = scaling_factor
+        self.fixed_size = size is not None
+        self.size = size or primary_display_size()
+        self.key = display_key(*self.size, scaling_factor) if self.size else None
+
+    def refresh(self):
+        # Re-reads the display size; returns True when the resolution, and so the key, changed.
+        if self.fixed_size:
+            return False
+        size = primary_display_size()
+        if not size or size == self.size:
+            return False
+        self.size = size
+        self.key = display_key(*size, self.scaling_factor)
+        return True
+
+    @property
+    def geometry_scale(self):
+        # The process is DPI aware, so the display size is in physical pixels; the
+        # DPI factor is only a guess for when the size is unknown.
+        if self.size:
+            return self.size[1] / REFERENCE_HEIGHT
+        return self.scaling_factor
+
+    def entry(self):
+        if self.key is None:
+            return {}
+        return (self.config_manager.get('display_calibration') or {}).get(self.key, {})
+
+    def get(self, field, default=None):
+        return self.entry().get(field, default)
+
+    def update(self, **fields):
+        if self.key is None:
+            return
+        # Copy rather than mutate so ConfigManager sees a changed value.
+        calibration = dict(self.config_manager.get('display_calibration') or {})
+        entry = dict(calibration.get(self.key, {}))
+        entry.update(fields)
+        calibration[self.key] = entry
+        self.config_manager.update_config({'display_calibration': calibration})
@@ -0,0 +1,58 @@
+import zlib
+
+
+class FrameChangeDetector:
+    def __init__(self):
+        self.layout = None
+        self.sentinels = ()
+        self.last_signature = None
+        self.checked = 0
+        self.skipped = 0
+
+    def reset(self):
+        self.last_signature = None
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def place_sentinels(self, height, width, rect):
+        x, y, w, h = rect
+        right = min(x + w - 1, width - 1)
+        # ROI corners and centre catch camera/UI movement; the pixels just
+        # above and below the bar ends catch the bar itself moving.
+        points = [
+            (0, 0), (0, width - 1), (height - 1, 0), (height - 1, width - 1), (height // 2, width // 2),
+            (max(y - 1, 0), x), (max(y - 1, 0), right),
+            (min(y + h, height - 1), x), (min(y + h, height - 1), right),
+        ]
+        self.sentinels = tuple(points)
+        self.layout = (height, width, rect)
+
+    def signature(self, pixels, rect):
+        height, width = pixels.shape[:2]
+        if self.layout != (height, width, rect):
+            self.place_sentinels(height, width, rect)
+        x, y, w, h = rect
+        middle = y + h // 2
+        crc = zlib.crc32(pixels[middle, x:x+w])
+        for row, col in self.sentinels:
+            crc = zlib.crc32(pixels[row, col], crc)
+        return crc
+
+    def remember(self, pixels, rect):
+        self.last_signature = self.signature(pixels, rect) if rect is not None else None
+
+    def unchanged(self, pixels, rect, reusable=True):
+        # True when the tracked scanline and sentinels match the previous frame exactly
+        # and the caller still holds a result for that frame.
+        self.checked += 1
+        if rect is None:
+            self.last_signature = None
+            return False
+        signature = self.signature(pixels, rect)
+        same = reusable and signature == self.last_signature
+        self.last_signature = signature
+        if same:
+            self.skipped += 1
+        return same
@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+import numpy as np
+import cv2
+
+from capture import create_capture
+from hp_detector import HPDetector, frame_pixels
+
+
+class Gauge:
+    def __init__(self, name, area, colour='red', threshold=None, key=None, cooldown=1.0, border=0):
+        self.name = name
+        self.area = area
+        self.colour = colour
+        self.threshold = threshold
+        self.key = key
+        self.cooldown = cooldown
+        self.border = border
+        self.last_value = None
+        self.last_triggered = 0.0
+
+    @classmethod
+    def from_config(cls, entry):
+        return cls(entry['name'], entry['area'], entry.get('colour', 'red'), entry.get('threshold'),
+                   entry.get('key'), entry.get('cooldown', 1.0), entry.get('border', 0))
+
+    @property
+    def width(self):
+        return self.area['width'] - 2 * self.border
+
+
+class GaugeEngine:
+    # Reads every gauge from one capture of their bounding box. The middle scanline of
+    # each gauge is gathered into a single row, so the colour conversion and range tests
+    # run once per frame regardless of how many gauges there are.
+    def __init__(self, gauges, key_presser=None, colour_ranges=None, capture='mss', interval=0.1):
+        self.key_presser = key_presser
+        self.detector = HPDetector(colour_ranges)
+        self.capture_name = capture
+        self.capture = None
+        self.interval = interval
+        self.thread = None
+        self.stop_requested = threading.Event()
+        self.values = None
+        self.set_gauges(gauges)
+
+    def set_gauges(self, gauges):
+        self.gauges = []
+        for gauge in gauges:
+            if gauge.width <= 0:
+                logging.warning(f"Ignoring gauge {gauge.name}: empty area {gauge.area}")
+            elif gauge.colour not in self.detector.thresholds:
+                logging.warning(f"Ignoring gauge {gauge.name}: unknown colour {gauge.colour}")
+            else:
+                self.gauges.append(gauge)
+        if not self.gauges:
+            self.bounds = None
+            return
+
+        left = min(g.area['left'] for g in self.gauges)
+        top = min(g.area['top'] for g in self.gauges)
+        right = max(g.area['left'] + g.area['width'] for g in self.gauges)
+        bottom = max(g.area['top'] + g.area['height'] for g in self.gauges)
+        self.bounds = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+
+        # Flat pixel indices of every gauge's scanline within the bounding frame.
+        indices = []
+        for gauge in self.gauges:
+            row = gauge.area['top'] - top + gauge.area['height'] // 2
+            column = gauge.area['left'] - left + gauge.border
+            indices.append(row * self.bounds['width'] + column + np.arange(gauge.width))
+        self.indices = np.concatenate(indices)
+        self.widths = np.array([g.width for g in self.gauges])
+        self.starts = np.concatenate(([0], np.cumsum(self.widths)[:-1]))
+        self.colours = sorted({g.colour for g in self.gauges})
+        self.colour_index = np.array([self.colours.index(g.colour) for g in self.gauges])
+        self.gauge_index = np.arange(len(self.gauges))
+
+        total = len(self.indices)
+        self.line = None
+        self.line_hsv = np.empty((1, total, 3), dtype=np.uint8)
+        self.line_mask = np.empty((1, total), dtype=np.uint8)
+        self.line_scratch = np.empty((1, total), dtype=np.uint8)
+        self.counts = np.empty((len(self.colours), len(self.gauges)), dtype=np.int64)
+        logging.info(f"Gauge engine tracking {len(self.gauges)} gauges, {total} scanline pixels in {self.bounds}")
+
+    def evaluate(self, frame):
+        pixels, code = frame_pixels(frame)
+        channels = pixels.shape[2]
+        if self.line is None or self.line.shape[2] != channels:
+            self.line = np.empty((1, len(self.indices), channels), dtype=np.uint8)
+        np.take(pixels.reshape(-1, channels), self.indices, axis=0, out=self.line[0])
+        cv2.cvtColor(self.line, code, dst=self.line_hsv)
+        for i, colour in enumerate(self.colours):
+            mask = self.detector.in_range(self.line_hsv, colour, self.line_mask, self.line_scratch)
+            np.add.reduceat(mask[0], self.starts, dtype=np.int64, out=self.counts[i])
+        self.values = self.counts[self.colour_index, self.gauge_index] / 255 / self.widths * 100
+        for gauge, value in zip(self.gauges, self.values):
+            gauge.last_value = float(value)
+        return self.values
+
+    def trigger(self, now):
+        for gauge in self.gauges:
+            if not gauge.key or gauge.threshold is None or gauge.last_value is None:
+                continue
+            if 1 < gauge.last_value < gauge.threshold and now - gauge.last_triggered >= gauge.cooldown:
+                # A refused press (paused or unsupported key) does not start the cooldown.
+                if self.key_presser and not self.key_presser.press_priority_key(gauge.key):
+                    continue
+                gauge.last_triggered = now
+                logging.info(f"Gauge {gauge.name} at {gauge.last_value:.1f}% (below {gauge.threshold}%). Pressing {gauge.key}")
+
+    def readings(self):
+        return {gauge.name: gauge.last_value for gauge in self.gauges}
+
+    def start(self):
+        if not self.gauges or (self.thread and self.thread.is_alive()):
+            return
+        self.stop_requested.clear()
+        self.thread = threading.Thread(target=self.run, name="GaugeEngine", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_requested.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        self.capture = create_capture(self.capture_name)
+        try:
+            while not self.stop_requested.is_set():
+                started = time.perf_counter()
+                try:
+                    self.evaluate(self.capture.grab(self.bounds))
+                    self.trigger(time.perf_counter())
+                except Exception as e:
+                    logging.error(f"Gauge evaluation failed: {e}")
+                self.stop_requested.wait(max(0.0, self.interval - (time.perf_counter() - started)))
+        finally:
+            self.capture.close()
@@ -2,27 +2,31 @@ import dearpygui.dearpygui as dpg
 import threading
 import logging
 import traceback
-from pynput import keyboard
-import numpy as np
-from PIL import Image
-import win32gui
 import time
 import os
 import json
 import sys
 from typing import List, Tuple
+from collections import deque
 import math
-import ctypes
+from array import array
+from render_scheduler import RenderScheduler
+from window_watcher import create_window_watcher
+from display_geometry import display_scaling_factor
+from input_hooks import InputHookService
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class GUI:
-    def __init__(self, config_manager, hp_monitor, key_presser):
+    def __init__(self, config_manager, hp_monitor, key_presser, render_scheduler=None, window_watcher=None, scaling_factor=None,
+                 input_hooks=None, profiler=None):
         self.config_manager = config_manager
+        self.window_watcher = window_watcher
         self.hp_monitor = hp_monitor
         self.key_presser = key_presser
         self.status_labels = {}
-        self.listener = None
+        self.input_hooks = input_hooks or InputHookService()
+        self.hotkey_subscription = None
         self.update_thread = None
         self.should_update = threading.Event()
         self.hp_history: List[Tuple[float, float]] = []
@@ -30,23 +34,23 @@ class GUI:
         self.key_input_ids = []
         self.freq_input_ids = []
         self.log_window = None
-        self.screenshot_texture_id = None
-        self.screenshot_image = None
-        self.frame_time = 1.0 / 60.0  # Target 60 FPS
-        self.scaling_factor = self.get_display_scaling_factor()
+        self.log_items = deque()
+        self.max_log_lines = self.config_manager.get('max_log_lines', 200)
+        self.status_themes = {}
+        self.status_colors = {}
+        self.preview_texture = None
+        self.preview_buffer = None
+        self.preview = None
+        self.last_preview_time = 0.0
+        self.render_scheduler = render_scheduler or RenderScheduler()
+        self.profiler = profiler
+        self.profiler_text = None
+        self.scaling_factor = scaling_factor if scaling_factor is not None else display_scaling_factor()
+        self.header_font = None
         self.config_changed = False
         self.use_party_hp_bar = self.config_manager.get('use_party_hp_bar', False)
 
 
-    def get_display_scaling_factor(self):
-        try:
-            user32 = ctypes.windll.user32
-            user32.SetProcessDPIAware()
-            return user32.GetDpiForSystem() / 96.0
-        except Exception as e:
-            logging.error(f"Failed to get display scaling factor: {e}")
-            return 1.0
-
     def setup(self):
         try:
             logging.debug("Setting up GUI")
@@ -69,7 +73,9 @@ class GUI:
                     self.create_log_window()    
 
             self.setup_viewport()
+            self.setup_input_handlers()
             self.setup_hotkeys()
+            self.setup_window_watcher()
             self.start_status_update_thread()
             
             dpg.set_primary_window("main_window", True)
@@ -79,18 +85,17 @@ class GUI:
             logging.error(traceback.format_exc())
             raise
 
-    def run_with_frame_limit(self):
-        while dpg.is_dearpygui_running():
-            start_time = time.perf_counter()
-            
-            dpg.render_dearpygui_frame()
-            
-            end_time = time.perf_counter()
-            frame_duration = end_time - start_time
-            if frame_duration < self.frame_time:
-                time.sleep(self.frame_time - frame_duration)
+    def setup_input_handlers(self):
+        # Any interaction with the window switches the render loop back to full rate.
+        with dpg.handler_registry():
+            dpg.add_mouse_move_handler(callback=lambda sender, app_data: self.render_scheduler.notify_input())
+            dpg.add_mouse_click_handler(callback=lambda sender, app_data: self.render_scheduler.notify_input())
+            dpg.add_mouse_wheel_handler(callback=lambda sender, app_data: self.render_scheduler.notify_input())
+            dpg.add_key_press_handler(callback=lambda sender, app_data: self.render_scheduler.notify_input())
 
     def load_font(self):
+        if self.header_font is not None:
+            return
         try:
             with dpg.font_registry():
                 default_font_path = self.get_resource_path(os.path.join("fonts", "OpenSans-Medium.ttf"))
@@ -206,9 +211,6 @@ class GUI:
                     with dpg.tooltip(parent=key_input):
                         dpg.add_text(f"Set the key to be auto-pressed for slot {i+1}")
 
-    def screenshot_image_available(self):
-        return True
-
     def create_hp_settings(self):
         with dpg.child_window(label="HP Settings", width=240, height=280):
             dpg.add_text("HP Settings:", color=(255, 255, 255))
@@ -281,26 +283,106 @@ class GUI:
             with dpg.tooltip(parent=self.select_screenshot_area_button):
                 dpg.add_text("Select the area of the screen where the HP bar is located")
 
-            with dpg.group(horizontal=True):
-                self.screenshot_group = dpg.add_group()
-            
-            # Initialize with "No Screenshot Area Selected" text
-            self.update_screenshot_display(None)
+            self.autotune_button = dpg.add_button(
+                label="Auto-Tune Capture",
+                callback=lambda sender, app_data, user_data: self.autotune(),
+                width=-1
+            )
+            with dpg.tooltip(parent=self.autotune_button):
+                dpg.add_text("Time the capture methods and HP estimators on the selected area and keep the fastest")
+
+            self.auto_locate_button = dpg.add_button(
+                label="Auto-Locate HP Bar",
+                callback=lambda sender, app_data, user_data: self.auto_locate_hp_bar(),
+                width=-1
+            )
+            with dpg.tooltip(parent=self.auto_locate_button):
+                dpg.add_text("Search the whole screen for the HP bar; the result is remembered for this resolution")
+
+            self.calibrate_colours_button = dpg.add_button(
+                label="Calibrate Colours",
+                callback=lambda sender, app_data, user_data: self.calibrate_colours(),
+                width=-1
+            )
+            with dpg.tooltip(parent=self.calibrate_colours_button):
+                dpg.add_text("Learn the HP bar colours from a few screenshots of the selected area")
+
+            self.create_preview()
+
+    def create_preview(self, width=220, height=48):
+        # One raw texture over a float buffer allocated here; updates write into it in place.
+        self.preview_size = (width, height)
+        self.preview_buffer = array('f', [0.0, 0.0, 0.0, 1.0] * (width * height))
+        with dpg.texture_registry():
+            self.preview_texture = dpg.add_raw_texture(width, height, self.preview_buffer, format=dpg.mvFormat_Float_rgba)
+        dpg.add_image(self.preview_texture)
+        self.preview_text = dpg.add_text("No Screenshot Area Selected", color=(255, 0, 0))
 
     def update_use_party_hp_bar(self, sender, app_data, user_data):
         self.use_party_hp_bar = dpg.get_value(self.party_hp_bar_checkbox)
         self.config_manager.set('use_party_hp_bar', self.use_party_hp_bar)
-        self.hp_monitor.use_party_hp_bar = self.use_party_hp_bar
+        self.hp_monitor.set_use_party_hp_bar(self.use_party_hp_bar)
         self.config_changed = True
 
     def select_screenshot_area(self):
         self.hp_monitor.select_screenshot_area()
         self.log_message("Screenshot area selected successfully", color=(0, 255, 0))
 
-    def update_screenshot_display(self, screenshot=None):
-        dpg.delete_item(self.screenshot_group, children_only=True)
-        if screenshot:
-            dpg.add_text("No Screenshot Area Selected", color=(255, 0, 0), parent=self.screenshot_group)
+    def calibrate_colours(self):
+        if self.hp_monitor.request_colour_calibration(on_done=self.calibrate_colours_done):
+            self.log_message("Colour calibration running...", color=(0, 255, 0))
+        else:
+            self.log_message("Colour calibration failed; select the HP bar area first", color=(255, 0, 0))
+
+    def calibrate_colours_done(self, success):
+        if success:
+            self.log_message("HP bar colours calibrated", color=(0, 255, 0))
+        else:
+            self.log_message("Colour calibration found no HP bar pixels", color=(255, 0, 0))
+
+    def autotune(self):
+        if self.hp_monitor.request_autotune(on_done=self.autotune_done):
+            self.log_message("Auto-tune running...", color=(0, 255, 0))
+        else:
+            self.log_message("Auto-tune unavailable; select the HP bar area and turn off the vision process",
+                             color=(255, 0, 0))
+
+    def autotune_done(self, success):
+        if not success:
+            self.log_message("Auto-tune failed; no capture backend worked", color=(255, 0, 0))
+            return
+        timings = self.hp_monitor.calibration.get('autotune_timings', {})
+        summary = ", ".join(f"{name} {ms:.1f} ms" for name, ms in timings.items())
+        self.log_message(f"Auto-tune: {self.hp_monitor.calibration.get('capture_backend')} capture ({summary})",
+                         color=(0, 255, 0))
+
+    def auto_locate_hp_bar(self):
+        if self.hp_monitor.auto_locate_hp_bar():
+            self.log_message(f"HP bar located at {self.hp_monitor.screenshot_area}", color=(0, 255, 0))
+        else:
+            self.log_message("HP bar not found on screen", color=(255, 0, 0))
+
+    def update_preview(self):
+        fps = self.config_manager.get('preview_fps', 5)
+        now = time.perf_counter()
+        if not fps or now - self.last_preview_time < 1.0 / fps:
+            return
+        self.last_preview_time = now
+        frame = self.hp_monitor.last_frame
+        if not self.hp_monitor.should_monitor.is_set() or frame is None:
+            return
+        # Captured BGRA pixels are passed as-is; the preview only reads the colour channels.
+        image = frame.pixels if getattr(frame, 'order', None) in ('BGRA', 'BGR') else frame.bgr
+        if image is None:
+            return
+        if self.preview is None:
+            from roi_preview import ROIPreview
+            self.preview = ROIPreview(*self.preview_size, buffer=self.preview_buffer)
+        self.preview.update(image, self.hp_monitor.last_hp_bar)
+        self.render_scheduler.notify_data()
+        area = self.hp_monitor.screenshot_area
+        dpg.set_value(self.preview_text, f"Area {area['width']}x{area['height']} at ({area['left']}, {area['top']})")
+        dpg.configure_item(self.preview_text, color=(160, 160, 160))
 
     def update_resolution(self, sender, app_data, user_data, unused):
         self.config_manager.set('resolution', app_data)
@@ -318,21 +400,36 @@ class GUI:
             }
             for label in self.status_labels.values():
                 self.update_status_label_color_coded(label, dpg.get_value(label))
+            self.render_stats_text = dpg.add_text("Render: -", color=(160, 160, 160))
+            if self.profiler:
+                with dpg.group(horizontal=True):
+                    self.profiler_checkbox = dpg.add_checkbox(label="Profile", default_value=self.profiler.enabled,
+                                                              callback=self.update_profiler_var)
+                    with dpg.tooltip(parent=self.profiler_checkbox):
+                        dpg.add_text("Report per-thread CPU and hot functions; snapshots go to profiler_snapshots")
+                    self.profiler_text = dpg.add_text("Profiler: off", color=(160, 160, 160))
 
-            with dpg.plot(label="HP Graph", height=200, width=-1):
+            with dpg.plot(label="HP Graph", height=200, width=-1) as hp_plot:
                 dpg.add_plot_legend()
                 dpg.add_plot_axis(dpg.mvXAxis, label="Time")
                 dpg.add_plot_axis(dpg.mvYAxis, label="HP %", tag="y_axis")
                 dpg.set_axis_limits("y_axis", 0, 200)
                 self.hp_series = dpg.add_line_series([], [], label="HP", parent="y_axis")
                 dpg.bind_item_handler_registry(self.hp_series, "hp_series_handler")
+                with dpg.tooltip(parent=hp_plot):
+                    dpg.add_text("", tag="hover_text")
+
+            with dpg.theme() as series_theme:
+                with dpg.theme_component(dpg.mvLineSeries):
+                    dpg.add_theme_color(dpg.mvPlotCol_Line, (139, 0, 0), category=dpg.mvThemeCat_Plots)
+                    dpg.add_theme_style(dpg.mvPlotStyleVar_FillAlpha, 0.5, category=dpg.mvThemeCat_Plots)
+            dpg.bind_item_theme(self.hp_series, series_theme)
 
             with dpg.item_handler_registry(tag="hp_series_handler"):
                 dpg.add_item_hover_handler(callback=self.hp_series_hover)
 
     def hp_series_hover(self, sender, app_data, user_data, unused):
         if self.hp_history:
-            plot = dpg.get_item_parent(sender)
             mouse_pos = dpg.get_plot_mouse_pos()
             start_time = self.hp_history[0][0]
             x = [(t - start_time) for t, _ in self.hp_history]
@@ -343,12 +440,6 @@ class GUI:
             dpg.set_value("hover_text", f"Time: {x[closest_point]:.2f}s, HP: {y[closest_point]:.2f}%")
             dpg.configure_item("hover_text", pos=dpg.get_mouse_pos())
 
-        with dpg.tooltip(parent=plot):
-            dpg.add_text("", tag="hover_text")
-
-        with dpg.tooltip(parent=plot):
-            dpg.add_text("", tag="hover_text")
-
     def create_profile_section(self):
         with dpg.child_window(label="Profiles", width=185, height=234):
             dpg.add_text("Profiles:", color=(255, 255, 255))
@@ -422,15 +513,32 @@ class GUI:
         dpg.set_viewport_large_icon(large_icon_path)
 
     def setup_hotkeys(self):
-        self.listener = keyboard.Listener(on_press=self.on_key_press)
-        self.listener.start()
+        self.hotkey_subscription = self.input_hooks.subscribe(self.on_key_press, ['f3'])
+        self.input_hooks.start()
+
+    def setup_window_watcher(self):
+        if self.window_watcher is None:
+            try:
+                self.window_watcher = create_window_watcher("Diablo IV", self.on_window_focus_changed)
+            except Exception as e:
+                logging.error(f"Unable to watch the Diablo IV window: {e}")
+        else:
+            self.window_watcher.subscribe(self.on_window_focus_changed)
+            self.window_watcher.start()
 
-    def on_key_press(self, key):
-        try:
-            if key == keyboard.Key.f3:
-                self.toggle_tool()
-        except AttributeError:
-            pass
+    def on_window_focus_changed(self, active):
+        if not self.config_manager.get('monitor_diablo_window', True):
+            return
+        if active:
+            self.key_presser.resume()
+        else:
+            self.key_presser.pause()
+
+    def is_diablo_window_active(self):
+        return self.window_watcher is None or self.window_watcher.is_active
+
+    def on_key_press(self, key, pressed):
+        self.toggle_tool()
 
     def toggle_tool(self):
         if self.key_presser.should_press.is_set():
@@ -440,6 +548,8 @@ class GUI:
             self.update_status_label("HP Monitoring Status: Stopped", "hp_monitoring_status")
         else:
             self.key_presser.start_pressing()
+            if self.config_manager.get('monitor_diablo_window', True) and not self.is_diablo_window_active():
+                self.key_presser.pause()
             if self.config_manager.get('monitor_hp'):
                 self.hp_monitor.start_monitoring()
             self.update_status_label("Tool Status: Tool Started", "tool_status")
@@ -472,6 +582,11 @@ class GUI:
     def update_frequency(self, sender, app_data, user_data, unused):
         self.config_manager.set(f'frequency_{user_data}', app_data / 1000)
         self.config_changed = True
+        self.warn_if_rotation_configured()
+
+    def warn_if_rotation_configured(self):
+        if self.config_manager.get('rotation'):
+            self.log_message("Key slots are ignored while a rotation is configured", color=(255, 200, 0))
 
     def update_hp_key(self, sender, app_data, user_data, unused):
         lowercase_key = app_data.lower()
@@ -487,6 +602,10 @@ class GUI:
         self.config_manager.set('hp_frequency', app_data)
         self.config_changed = True
 
+    def update_profiler_var(self, sender, app_data, user_data):
+        self.config_manager.set('profiler_enabled', app_data)
+        self.profiler.set_enabled(app_data)
+
     def update_monitor_hp_var(self, sender, app_data, user_data, unused):
         self.config_manager.set('monitor_hp', dpg.get_value(self.monitor_hp_checkbox))
         self.config_changed = True
@@ -504,7 +623,7 @@ class GUI:
         red_color = [255, 0, 0]
         green_color = [0, 255, 0]
 
-        if any(word in text for word in ["Idle"]):
+        if any(word in text for word in ["Idle", "Paused"]):
             color = orange_color
         elif any(word in text for word in ["Not Active", "Stopped", "Disabled", "Tool Stopped", "Monitoring Disabled"]):
             color = red_color
@@ -513,53 +632,75 @@ class GUI:
         else:
             color = [255, 255, 255]
 
-        with dpg.theme() as theme_id:
-            with dpg.theme_component(dpg.mvAll):
-                dpg.add_theme_color(dpg.mvThemeCol_Text, color)
-
-        dpg.bind_item_theme(label, theme_id)
+        # One theme per colour, bound only when a label changes colour; creating a theme on
+        # every update leaks items over long sessions.
+        color = tuple(color)
+        if self.status_colors.get(label) != color:
+            if color not in self.status_themes:
+                with dpg.theme() as theme_id:
+                    with dpg.theme_component(dpg.mvAll):
+                        dpg.add_theme_color(dpg.mvThemeCol_Text, color)
+                self.status_themes[color] = theme_id
+            dpg.bind_item_theme(label, self.status_themes[color])
+            self.status_colors[label] = color
         dpg.set_value(label, text)
 
     def update_status_label_thread_safe(self, label, text):
-        threading.Thread(target=self.update_status_label_color_coded, args=(label, text)).start()
+        threading.Thread(target=self.update_status_label_color_coded, args=(label, text), name="StatusLabel").start()
 
     def start_status_update_thread(self):
         self.should_update.set()
-        self.update_thread = threading.Thread(target=self.update_status_labels)
+        self.update_thread = threading.Thread(target=self.update_status_labels, name="StatusUpdater")
         self.update_thread.daemon = True
         self.update_thread.start()
 
     def update_status_labels(self):
+        last_stats_time = 0.0
         while self.should_update.is_set():
             self.update_diablo_window_status()
             self.update_hp()
             self.update_hp_graph()
+            self.update_preview()
+            now = time.perf_counter()
+            if now - last_stats_time >= 1.0:
+                self.update_render_stats()
+                last_stats_time = now
             time.sleep(0.1)
 
+    def update_render_stats(self):
+        stats = self.render_scheduler.stats()
+        mode = "idle" if stats["idle"] else "active"
+        text = f"Render: {stats['fps']:.1f} FPS ({mode}), CPU {stats['cpu_percent']:.1f}% / {stats['cpu_time']:.1f}s"
+        if self.preview and self.preview.updates:
+            text += f", preview {self.preview.average_ms:.2f} ms"
+        dpg.set_value(self.render_stats_text, text)
+        if self.profiler_text:
+            status = f"Profiler: {self.profiler.busiest()}" if self.profiler.enabled else "Profiler: off"
+            dpg.set_value(self.profiler_text, status)
+
     def update_diablo_window_status(self):
-        active_window = win32gui.GetWindowText(win32gui.GetForegroundWindow())
-        if "Diablo IV" in active_window:
-            if self.key_presser.should_press.is_set():
-                status = "Diablo IV Window Status: Active - Tool Running"
-            else:
-                status = "Diablo IV Window Status: Active - Tool Stopped"
+        # Pausing and resuming is driven by the window watcher; this only reflects the state.
+        window = "Active" if self.is_diablo_window_active() else "Not Active"
+        if not self.key_presser.should_press.is_set():
+            tool = "Tool Stopped"
+        elif self.key_presser.is_paused.is_set():
+            tool = "Tool Paused"
         else:
-            if self.key_presser.should_press.is_set():
-                status = "Diablo IV Window Status: Not Active - Tool Stopped"
-                self.key_presser.stop_pressing()  # Instead of pausing, stop the tool
-            else:
-                status = "Diablo IV Window Status: Not Active - Tool Stopped"
-        self.update_status_label(status, "d4_status")
+            tool = "Tool Running"
+        self.update_status_label(f"Diablo IV Window Status: {window} - {tool}", "d4_status")
 
     def update_hp(self):
+        # The monitoring thread owns capture and detection; only read its latest sample here.
         if self.hp_monitor.should_monitor.is_set():
-            result = self.hp_monitor.get_hp_percentage()
-            if result is not None:
-                hp_percentage, screenshot = result
+            hp_percentage = self.hp_monitor.last_hp_percentage
+            sample_time = self.hp_monitor.last_sample_time
+            if hp_percentage is not None:
                 status = f"Current HP: {hp_percentage:.2f}%"
-                self.hp_history.append((time.time(), hp_percentage))
-                if len(self.hp_history) > 60:  # Keep only last 60 seconds
-                    self.hp_history.pop(0)
+                if not self.hp_history or self.hp_history[-1][0] != sample_time:
+                    self.hp_history.append((sample_time, hp_percentage))
+                    if len(self.hp_history) > 60:  # Keep only last 60 seconds
+                        self.hp_history.pop(0)
+                    self.render_scheduler.notify_data()
             else:
                 status = "Current HP: Unable to calculate"
         else:
@@ -573,17 +714,10 @@ class GUI:
             y = [hp for _, hp in self.hp_history]
             dpg.set_value(self.hp_series, [x, y])
 
-            # Update the gradient for the HP graph
-            with dpg.theme() as series_theme:
-                with dpg.theme_component(dpg.mvLineSeries):
-                    dpg.add_theme_color(dpg.mvPlotCol_Line, (139, 0, 0), category=dpg.mvThemeCat_Plots)
-                    dpg.add_theme_style(dpg.mvPlotStyleVar_FillAlpha, 0.5, category=dpg.mvThemeCat_Plots)
-            dpg.bind_item_theme(self.hp_series, series_theme)
-
     def save_profile(self, sender, app_data, user_data, unused):
         profile_name = dpg.get_value(self.profile_name)
         if not profile_name:
-            dpg.add_text("Please enter a profile name", color=(255, 0, 0), parent="main_window")
+            self.log_message("Please enter a profile name", color=(255, 0, 0))
             return
 
         if not os.path.exists(self.profiles_dir):
@@ -653,6 +787,7 @@ class GUI:
         self.config_manager.set(f'key_to_press_{user_data}', key_value)
         dpg.set_value(sender, 'Space' if key_value == ' ' else key_value)
         self.config_changed = True
+        self.warn_if_rotation_configured()
         
     def get_original_callback(self, item):
         if item in self.key_input_ids:
@@ -698,19 +833,25 @@ class GUI:
             self.log_window = dpg.add_child_window(label="Log Content", autosize_x=True, autosize_y=True)
 
     def log_message(self, message, color=(255, 255, 255)):
-        dpg.add_text(message, color=color, wrap=580, parent=self.log_window)
+        self.log_items.append(dpg.add_text(message, color=color, wrap=580, parent=self.log_window))
+        while len(self.log_items) > self.max_log_lines:
+            dpg.delete_item(self.log_items.popleft())
         dpg.set_y_scroll(self.log_window, -1)  # Scroll to the bottom
+        self.render_scheduler.notify_data()
 
     def cleanup(self):
         self.should_update.clear()
         if self.update_thread:
             self.update_thread.join()
-        if self.listener:
-            self.listener.stop()
+        if self.hotkey_subscription:
+            self.input_hooks.unsubscribe(self.hotkey_subscription)
+        self.input_hooks.stop()
+        if self.window_watcher:
+            self.window_watcher.stop()
         self.key_presser.stop_pressing()
         self.hp_monitor.stop_monitoring()
 
 if __name__ == "__main__":
     gui = GUI(None, None, None)  # For testing purposes only
     gui.setup()
-    gui.run_with_frame_limit()
\ No newline at end of file
+    gui.render_scheduler.run(dpg.render_dearpygui_frame, dpg.is_dearpygui_running)
\ No newline at end of file
@@ -0,0 +1,224 @@
+import math
+import logging
+import numpy as np
+import cv2
+from frame_change import FrameChangeDetector
+
+# HSV ranges per colour class, as (lower, upper) pairs.
+COLOUR_RANGES = {
+    "blue_bar": [((100, 30, 50), (140, 255, 255))],
+    "blue": [((100, 30, 100), (140, 255, 255))],
+    "yellow": [((10, 65, 15), (50, 185, 185))],
+    "black": [((0, 0, 0), (180, 255, 25))],
+    "red": [((0, 100, 100), (10, 255, 255)), ((160, 100, 100), (179, 255, 255))],
+}
+
+
+# Size gates as (min, max) in pixels for a 1080-line display.
+BASE_GEOMETRY = {
+    "regular_width": (55, 90),
+    "regular_height": (4, 12),
+    "party_width": (50, 170),
+    "party_height": (5, 15),
+    "party_aspect": (5, 15),
+}
+
+
+def scaled_geometry(scale, regular_bar=None, tolerance=0.2):
+    # Gates scaled to the display; a previously measured regular bar narrows them around
+    # its size. The party rect is only the red fill, so its width follows HP and stays open.
+    geometry = {"party_aspect": BASE_GEOMETRY["party_aspect"]}
+    for name in ("regular_width", "regular_height", "party_width", "party_height"):
+        low, high = BASE_GEOMETRY[name]
+        geometry[name] = (max(1, int(low * scale)), int(math.ceil(high * scale)))
+    if regular_bar:
+        w, h = regular_bar
+        geometry["regular_width"] = (int(w * (1 - tolerance)), int(math.ceil(w * (1 + tolerance))))
+        geometry["regular_height"] = (max(1, h - 2), h + 2)
+    return geometry
+
+
+def frame_pixels(frame):
+    # Accepts a capture.Frame or a plain BGR(A) array.
+    return getattr(frame, 'pixels', frame), getattr(frame, 'hsv_code', cv2.COLOR_BGR2HSV)
+
+
+class HPDetector:
+    def __init__(self, colour_ranges=None, geometry=None):
+        self.set_geometry(geometry or BASE_GEOMETRY)
+        self.set_colour_ranges(colour_ranges or COLOUR_RANGES)
+        self.frame_size = None
+        self.line_width = None
+        self.fallback_passes = 0
+
+    def set_geometry(self, geometry):
+        self.regular_width = tuple(geometry["regular_width"])
+        self.regular_height = tuple(geometry["regular_height"])
+        self.party_width = tuple(geometry["party_width"])
+        self.party_height = tuple(geometry["party_height"])
+        self.party_aspect = tuple(geometry["party_aspect"])
+
+    def set_colour_ranges(self, colour_ranges):
+        # Threshold arrays are built once instead of on every frame.
+        self.thresholds = {
+            name: [(np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8)) for lower, upper in ranges]
+            for name, ranges in colour_ranges.items()
+        }
+
+    def ensure_workspace(self, height, width):
+        if self.frame_size == (height, width):
+            return
+        self.frame_size = (height, width)
+        self.hsv = np.empty((height, width, 3), dtype=np.uint8)
+        self.fill_mask = np.empty((height, width), dtype=np.uint8)
+        self.black_mask = np.empty((height, width), dtype=np.uint8)
+        self.combined_mask = np.empty((height, width), dtype=np.uint8)
+        self.scratch_mask = np.empty((height, width), dtype=np.uint8)
+        logging.debug(f"HP detector workspace allocated for {width}x{height}")
+
+    def ensure_line_workspace(self, width):
+        if self.line_width == width:
+            return
+        self.line_width = width
+        self.line_hsv = np.empty((1, width, 3), dtype=np.uint8)
+        self.line_mask = np.empty((1, width), dtype=np.uint8)
+        self.line_scratch = np.empty((1, width), dtype=np.uint8)
+
+    def in_range(self, hsv, colour, dst, scratch):
+        ranges = self.thresholds[colour]
+        lower, upper = ranges[0]
+        cv2.inRange(hsv, lower, upper, dst=dst)
+        for lower, upper in ranges[1:]:
+            cv2.inRange(hsv, lower, upper, dst=scratch)
+            cv2.bitwise_or(dst, scratch, dst=dst)
+        return dst
+
+    def to_hsv(self, frame):
+        pixels, code = frame_pixels(frame)
+        self.ensure_workspace(pixels.shape[0], pixels.shape[1])
+        return cv2.cvtColor(pixels, code, dst=self.hsv)
+
+    def regular_size_ok(self, w, h):
+        return self.regular_width[0] <= w <= self.regular_width[1] and self.regular_height[0] <= h <= self.regular_height[1]
+
+    def party_size_ok(self, w, h):
+        return (self.party_width[0] <= w <= self.party_width[1] and self.party_height[0] <= h <= self.party_height[1]
+                and self.party_aspect[0] <= w / h <= self.party_aspect[1])
+
+    def largest_rect(self, contours):
+        largest = max(contours, key=cv2.contourArea)
+        return cv2.boundingRect(largest)
+
+    def detect_regular(self, frame):
+        hsv = self.to_hsv(frame)
+        black = self.in_range(hsv, "black", self.black_mask, self.scratch_mask)
+        blue = self.in_range(hsv, "blue_bar", self.fill_mask, self.scratch_mask)
+        cv2.bitwise_or(blue, black, dst=self.combined_mask)
+
+        contours, _ = cv2.findContours(self.combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        valid_contours = [c for c in contours if self.regular_size_ok(*cv2.boundingRect(c)[2:])]
+
+        if not valid_contours:
+            self.fallback_passes += 1
+            yellow = self.in_range(hsv, "yellow", self.fill_mask, self.scratch_mask)
+            cv2.bitwise_or(yellow, black, dst=self.combined_mask)
+            contours, _ = cv2.findContours(self.combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            for contour in contours:
+                x, y, w, h = cv2.boundingRect(contour)
+                if self.regular_size_ok(w, h):
+                    if cv2.countNonZero(self.combined_mask[y:y+h, x:x+w]) == w * h:
+                        valid_contours.append(contour)
+                        logging.info("Found valid yellow-black contour.")
+                    else:
+                        logging.info("Found yellow-black contour with other colors. Ignoring.")
+
+        if valid_contours:
+            return self.largest_rect(valid_contours)
+        logging.warning("No valid HP bar detected in the screenshot.")
+        return None
+
+    def detect_party(self, frame):
+        hsv = self.to_hsv(frame)
+        red = self.in_range(hsv, "red", self.fill_mask, self.scratch_mask)
+        contours, _ = cv2.findContours(red, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        valid_contours = [c for c in contours if self.party_size_ok(*cv2.boundingRect(c)[2:])]
+        if valid_contours:
+            return self.largest_rect(valid_contours)
+        logging.warning("No valid party HP bar detected in the screenshot.")
+        return None
+
+    def scanline_hsv(self, frame, rect):
+        x, y, w, h = rect
+        middle = y + h // 2
+        pixels, code = frame_pixels(frame)
+        self.ensure_line_workspace(w)
+        return cv2.cvtColor(pixels[middle:middle+1, x:x+w], code, dst=self.line_hsv)
+
+    def regular_percentage(self, frame, rect):
+        # Returns (percentage, confidence); the yellow fallback is trusted less.
+        w = rect[2]
+        hsv = self.scanline_hsv(frame, rect)
+        blue_pixels = cv2.countNonZero(self.in_range(hsv, "blue", self.line_mask, self.line_scratch))
+        if blue_pixels:
+            return (blue_pixels / (w - 2)) * 100, 1.0
+        yellow_pixels = cv2.countNonZero(self.in_range(hsv, "yellow", self.line_mask, self.line_scratch))
+        return (yellow_pixels / (w - 2)) * 100, 0.5
+
+    def party_percentage(self, frame, rect):
+        w = rect[2]
+        hsv = self.scanline_hsv(frame, rect)
+        red_pixels = cv2.countNonZero(self.in_range(hsv, "red", self.line_mask, self.line_scratch))
+        return (red_pixels / w) * 100, 1.0
+
+
+class HPEstimator:
+    # Per-frame pipeline shared by the monitoring thread and the vision worker process.
+    def __init__(self, use_party_hp_bar=False, skip_unchanged=True, detector=None):
+        self.detector = detector or HPDetector()
+        self.frame_change = FrameChangeDetector()
+        self.use_party_hp_bar = use_party_hp_bar
+        self.skip_unchanged = skip_unchanged
+        self.party_hp_bar_position = None
+        self.last_hp_bar = None
+        self.last_confidence = 0.0
+        self.last_estimate = None
+
+    def set_use_party_hp_bar(self, use_party_hp_bar):
+        self.use_party_hp_bar = use_party_hp_bar
+        self.last_estimate = None
+
+    def reset(self):
+        self.last_estimate = None
+        self.frame_change = FrameChangeDetector()
+
+    def detect_hp_bar(self, frame):
+        if not self.use_party_hp_bar:
+            return self.detector.detect_regular(frame)
+        if self.party_hp_bar_position is None:
+            self.party_hp_bar_position = self.detector.detect_party(frame)
+        return self.party_hp_bar_position
+
+    def estimate(self, frame):
+        pixels = frame_pixels(frame)[0]
+        if self.skip_unchanged and self.frame_change.unchanged(
+                pixels, self.last_hp_bar, reusable=self.last_estimate is not None):
+            return self.last_estimate
+
+        hp_bar = self.detect_hp_bar(frame)
+        if hp_bar is None:
+            logging.warning("HP bar not detected in the screenshot.")
+            self.last_estimate = None
+            return None
+
+        if self.skip_unchanged and hp_bar != self.last_hp_bar:
+            self.frame_change.remember(pixels, hp_bar)
+        self.last_hp_bar = hp_bar
+        if self.use_party_hp_bar:
+            hp_percentage, self.last_confidence = self.detector.party_percentage(frame, hp_bar)
+        else:
+            hp_percentage, self.last_confidence = self.detector.regular_percentage(frame, hp_bar)
+
+        logging.info(f"Calculated HP percentage: {hp_percentage:.2f}%")
+        self.last_estimate = hp_percentage
+        return hp_percentage
+
@@ -0,0 +1,110 @@
+import time
+import logging
+import numpy as np
+import cv2
+
+from capture import frame_from_screenshot
+from hp_detector import HPDetector, frame_pixels
+
+
+class HPBarLocator:
+    def __init__(self, detector=None, levels=2, max_candidates=6, margin=12):
+        self.detector = detector or HPDetector()
+        self.levels = levels
+        self.max_candidates = max_candidates
+        self.margin = margin
+
+    def coarse_mask(self, pixels, code, use_party_hp_bar):
+        small = pixels
+        for _ in range(self.levels):
+            small = cv2.pyrDown(small)
+        hsv = cv2.cvtColor(small, code)
+        mask = np.empty(hsv.shape[:2], dtype=np.uint8)
+        scratch = np.empty_like(mask)
+        if use_party_hp_bar:
+            self.detector.in_range(hsv, "red", mask, scratch)
+        else:
+            # Only the filled part is searched for; the empty (black) part is
+            # indistinguishable from dark scenery at this scale.
+            fill = np.empty_like(mask)
+            self.detector.in_range(hsv, "blue_bar", mask, scratch)
+            self.detector.in_range(hsv, "yellow", fill, scratch)
+            cv2.bitwise_or(mask, fill, dst=mask)
+        return mask
+
+    def candidates(self, mask, use_party_hp_bar):
+        scale = 2 ** self.levels
+        if use_party_hp_bar:
+            max_width, max_height = self.detector.party_width[1], self.detector.party_height[1]
+        else:
+            max_width, max_height = self.detector.regular_width[1], self.detector.regular_height[1]
+        max_width = max_width / scale + 2
+        max_height = max_height / scale + 2
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        scored = []
+        for x, y, w, h, area in stats[1:count]:
+            if w > max_width or h > max_height:
+                continue
+            # Bars are thin, horizontal and solidly filled.
+            elongation = min(w / max(h, 1), 15) / 15
+            solidity = area / float(w * h)
+            scored.append((elongation * solidity * min(w / max_width, 1.0), (x, y, w, h)))
+        scored.sort(reverse=True)
+        return [rect for _, rect in scored[:self.max_candidates]]
+
+    def refine(self, pixels, rect, use_party_hp_bar):
+        scale = 2 ** self.levels
+        x, y, w, h = rect
+        bar_width = self.detector.party_width[1] if use_party_hp_bar else self.detector.regular_width[1]
+        height, width = pixels.shape[:2]
+        # The fill may be only a sliver of the bar, so allow a full bar width either side.
+        left = max(0, x * scale - bar_width)
+        right = min(width, (x + w) * scale + bar_width)
+        top = max(0, y * scale - self.margin)
+        bottom = min(height, (y + h) * scale + self.margin)
+        region = pixels[top:bottom, left:right]
+        if use_party_hp_bar:
+            found = self.detector.detect_party(region)
+        else:
+            found = self.detector.detect_regular(region)
+        if found is None:
+            return None
+        fx, fy, fw, fh = found
+        return int(left + fx), int(top + fy), int(fw), int(fh)
+
+    def locate(self, frame, use_party_hp_bar=False):
+        pixels, code = frame_pixels(frame)
+        start = time.perf_counter()
+        mask = self.coarse_mask(pixels, code, use_party_hp_bar)
+        best = None
+        for candidate in self.candidates(mask, use_party_hp_bar):
+            rect = self.refine(pixels, candidate, use_party_hp_bar)
+            if rect is not None and (best is None or rect[2] * rect[3] > best[2] * best[3]):
+                best = rect
+        logging.info(f"HP bar search took {(time.perf_counter() - start) * 1000:.1f} ms: {best}")
+        return best
+
+    def area_around(self, rect, frame_shape, offset=(0, 0)):
+        x, y, w, h = rect
+        height, width = frame_shape[:2]
+        left = max(0, x - self.margin)
+        top = max(0, y - self.margin)
+        right = min(width, x + w + self.margin)
+        bottom = min(height, y + h + self.margin)
+        return {
+            "top": int(top + offset[1]),
+            "left": int(left + offset[0]),
+            "width": int(right - left),
+            "height": int(bottom - top)
+        }
+
+    def locate_on_screen(self, use_party_hp_bar=False):
+        from mss import mss
+        with mss() as sct:
+            monitor = sct.monitors[1]
+            frame = frame_from_screenshot(sct.grab(monitor))
+            rect = self.locate(frame, use_party_hp_bar)
+            if rect is None:
+                return None
+            return self.area_around(rect, frame.shape, (monitor['left'], monitor['top']))
@@ -1,36 +1,139 @@
-import numpy as np
 import time
 import logging
 import threading
-import os
-import cv2
-import pyautogui
-from mss import mss
-from PIL import Image, ImageGrab
-from datetime import datetime
+from image_writer import HPImageWriter
+from display_geometry import DisplayCalibration
+from clock import REAL_CLOCK
+from metrics import REGISTRY
+
+# The vision stack (NumPy, OpenCV, mss) is only imported once HP monitoring
+# is started or an area is selected; see load_vision_stack().
+np = None
+cv2 = None
+mss = None
+vision_lock = threading.Lock()
+
+def load_vision_stack():
+    global np, cv2, mss
+    if cv2 is not None:
+        return
+    with vision_lock:
+        if cv2 is not None:
+            return
+        start = time.perf_counter()
+        import numpy
+        from mss import mss as mss_factory
+        import cv2 as opencv
+        np, mss = numpy, mss_factory
+        cv2 = opencv
+        logging.info(f"Vision stack loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
 
 class HPMonitor:
-    def __init__(self, config_manager, key_presser, scaling_factor):
+    def __init__(self, config_manager, key_presser, scaling_factor, recorder=None, clock=None):
         self.config_manager = config_manager
+        self.clock = clock or REAL_CLOCK
+        self.recorder = recorder
         self.key_presser = key_presser
         self.scaling_factor = scaling_factor
         self.screenshot_area = None
         self.monitoring_thread = None
         self.should_monitor = threading.Event()
-        self.sct = mss()
         self.use_party_hp_bar = self.config_manager.get('use_party_hp_bar', False)
-        self.party_hp_bar_position = None
+        self.last_hp_bar = None
+        self.last_confidence = 0.0
+        self.estimator = None
+        self.capture_backends = None
+        self.vision_process = None
+        self.gauge_engine = None
+        self.potion = None
+        self.last_hp_percentage = None
+        self.last_sample_time = None
+        self.last_frame = None
+        self.autotune_thread = None
+        self.autotune_applied = False
+        self.colour_thread = None
+        self.colours_applied = False
+        self.key_presser.hp_source = lambda: self.last_hp_percentage
+        self.samples_metric = REGISTRY.counter("hp_samples", "HP readings taken.")
+        self.failures_metric = REGISTRY.counter("hp_detection_failures", "Samples where no HP bar was found.")
+        self.potions_metric = REGISTRY.counter("potion_presses", "HP potion key presses.")
+        self.frame_metric = REGISTRY.histogram("hp_frame_seconds", "Capture and detection time per in-process HP sample.")
+        REGISTRY.gauge("hp_percent", "Latest HP reading.",
+                       lambda: self.last_hp_percentage if self.last_hp_percentage is not None else float('nan'))
+        self.image_writer = self.create_image_writer()
+        self.calibration = DisplayCalibration(config_manager, scaling_factor)
+        self.bar_size_recorded = False
+        self.load_cached_area()
+
+    def area_field(self):
+        return 'party_hp_area' if self.use_party_hp_bar else 'hp_area'
+
+    def detector_geometry(self):
+        from hp_detector import scaled_geometry
+        return scaled_geometry(self.calibration.geometry_scale, self.calibration.get('hp_bar_size'))
+
+    def create_detector(self):
+        from hp_detector import HPDetector
+        return HPDetector(self.calibration.get('colour_ranges'), self.detector_geometry())
+
+    def remember_bar_size(self):
+        # Once per session, so the gates tighten around the bar on the next start. Only the
+        # regular bar has a fixed width; the party rect shrinks with HP.
+        if self.use_party_hp_bar or self.bar_size_recorded or not self.last_hp_bar or self.last_confidence < 1.0:
+            return
+        self.bar_size_recorded = True
+        size = [int(self.last_hp_bar[2]), int(self.last_hp_bar[3])]
+        if self.calibration.get('hp_bar_size') != size:
+            self.calibration.update(hp_bar_size=size)
+            logging.info(f"Calibrated HP bar size {size} for {self.calibration.key}")
+
+    def load_cached_area(self):
+        area = self.calibration.get(self.area_field())
+        if area:
+            self.screenshot_area = dict(area)
+            logging.info(f"Using cached screenshot area for {self.calibration.key}: {self.screenshot_area}")
+
+    def set_screenshot_area(self, area):
+        self.screenshot_area = area
+        self.calibration.update(**{self.area_field(): area})
+        if self.estimator:
+            self.estimator.reset()
+        if self.vision_process:
+            self.vision_process.send('area', self.screenshot_area)
+
+    def create_image_writer(self):
+        return HPImageWriter(
+            max_files=self.config_manager.get('hp_image_max_files', 200),
+            max_bytes=int(self.config_manager.get('hp_image_max_mb', 50) * 1024 * 1024),
+            min_interval=self.config_manager.get('hp_image_interval', 1.0)
+        )
 
     def update_config(self, new_config):
         self.config_manager.update_config(new_config)
         self.use_party_hp_bar = self.config_manager.get('use_party_hp_bar', False)
+        self.estimator = None
         if self.should_monitor.is_set():
             self.stop_monitoring()
+            self.image_writer = self.create_image_writer()
             self.start_monitoring()
+        else:
+            self.image_writer = self.create_image_writer()
+
+    def set_use_party_hp_bar(self, use_party_hp_bar):
+        self.use_party_hp_bar = use_party_hp_bar
+        self.bar_size_recorded = False
+        self.load_cached_area()
+        if self.estimator:
+            self.estimator.set_use_party_hp_bar(use_party_hp_bar)
+        if self.vision_process:
+            self.vision_process.send('use_party_hp_bar', use_party_hp_bar)
+            self.vision_process.send('area', self.screenshot_area)
 
     def select_screenshot_area(self):
         logging.info("Selecting screenshot area...")
         try:
+            load_vision_stack()
+            from PIL import ImageGrab
             screenshot = ImageGrab.grab()
             screenshot.save("temp_screenshot.png")
             
@@ -39,238 +142,362 @@ class HPMonitor:
             roi = cv2.selectROI("Select HP Bar Area", img, False)
             cv2.destroyAllWindows()
             
-            self.screenshot_area = {
-                "top": roi[1],
-                "left": roi[0],
-                "width": roi[2],
-                "height": roi[3]
-            }
+            self.set_screenshot_area({
+                "top": int(roi[1]),
+                "left": int(roi[0]),
+                "width": int(roi[2]),
+                "height": int(roi[3])
+            })
             logging.info(f"Screenshot area selected: {self.screenshot_area}")
         except Exception as e:
             logging.error(f"Error selecting screenshot area: {e}")
 
-    def detect_hp_bar(self, screenshot):
-        if self.use_party_hp_bar:
-            return self.detect_party_hp_bar(screenshot)
-        else:
-            return self.detect_regular_hp_bar(screenshot)
-
-    def detect_regular_hp_bar(self, screenshot):
-        hsv = cv2.cvtColor(screenshot, cv2.COLOR_BGR2HSV)
-        lower_blue = np.array([100, 30, 50])
-        upper_blue = np.array([140, 255, 255])
-        blue_mask = cv2.inRange(hsv, lower_blue, upper_blue)
-        lower_black = np.array([0, 0, 0])
-        upper_black = np.array([180, 255, 25])
-        black_mask = cv2.inRange(hsv, lower_black, upper_black)
-
-        combined_mask = cv2.bitwise_or(blue_mask, black_mask)
-
-        contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        valid_contours = []
-
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
-            if 55 <= w <= 90 and 4 <= h <= 12:
-                valid_contours.append(contour)
-
-        if not valid_contours:
-            lower_yellow = np.array([10, 65, 15])
-            upper_yellow = np.array([50, 185, 185])
-            yellow_mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
-            combined_mask = cv2.bitwise_or(yellow_mask, black_mask)
-
-            contours, _ = cv2.findContours(combined_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            for contour in contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                if 55 <= w <= 90 and 4 <= h <= 12:
-                    roi = screenshot[y:y+h, x:x+w]
-                    hsv_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-                    yellow_black_mask = cv2.bitwise_or(cv2.inRange(hsv_roi, lower_yellow, upper_yellow),
-                                                       cv2.inRange(hsv_roi, lower_black, upper_black))
-                    if np.count_nonzero(yellow_black_mask) == roi.shape[0] * roi.shape[1]:
-                        valid_contours.append(contour)
-                        logging.info("Found valid yellow-black contour.")
-                    else:
-                        logging.info("Found yellow-black contour with other colors. Ignoring.")
-
-        if valid_contours:
-            largest_contour = max(valid_contours, key=cv2.contourArea)
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            return x, y, w, h
-        else:
-            logging.warning("No valid HP bar detected in the screenshot.")
-            return None
-
-    def detect_party_hp_bar(self, screenshot):
-        if self.party_hp_bar_position is not None:
-            return self.party_hp_bar_position
-
-        hsv = cv2.cvtColor(screenshot, cv2.COLOR_BGR2HSV)
-        lower_red = np.array([0, 100, 100])
-        upper_red = np.array([10, 255, 255])
-        red_mask1 = cv2.inRange(hsv, lower_red, upper_red)
-        lower_red = np.array([160, 100, 100])
-        upper_red = np.array([179, 255, 255])
-        red_mask2 = cv2.inRange(hsv, lower_red, upper_red)
-        red_mask = cv2.bitwise_or(red_mask1, red_mask2)
-
-        contours, _ = cv2.findContours(red_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        valid_contours = []
-
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
-            aspect_ratio = w / h
-            if 50 <= w <= 170 and 5 <= h <= 15 and 5 <= aspect_ratio <= 15:
-                valid_contours.append(contour)
-
-        if valid_contours:
-            largest_contour = max(valid_contours, key=cv2.contourArea)
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            self.party_hp_bar_position = (x, y, w, h)
-            return x, y, w, h
-        else:
-            logging.warning("No valid party HP bar detected in the screenshot.")
-            return None
-
-    def calculate_party_hp_percentage(self, hp_bar_img):
-        h, w = hp_bar_img.shape[:2]
-        middle_line = h // 2
-        hp_line = hp_bar_img[middle_line:middle_line+1, :]
-
-        hsv = cv2.cvtColor(hp_line, cv2.COLOR_BGR2HSV)
-
-        lower_red = np.array([0, 100, 100])
-        upper_red = np.array([10, 255, 255])
-        mask1 = cv2.inRange(hsv, lower_red, upper_red)
-        lower_red = np.array([160, 100, 100])
-        upper_red = np.array([179, 255, 255])
-        mask2 = cv2.inRange(hsv, lower_red, upper_red)
-        mask = cv2.bitwise_or(mask1, mask2)
-
-        red_pixels = cv2.countNonZero(mask)
-        hp_percentage = (red_pixels / w) * 100
+    def auto_locate_hp_bar(self):
+        logging.info("Searching the screen for the HP bar...")
+        try:
+            load_vision_stack()
+            from hp_locator import HPBarLocator
+            margin = max(4, int(round(12 * self.calibration.geometry_scale)))
+            area = HPBarLocator(self.create_detector(), margin=margin).locate_on_screen(self.use_party_hp_bar)
+        except Exception as e:
+            logging.error(f"Error locating HP bar: {e}")
+            return False
+        if area is None:
+            logging.warning("HP bar not found on screen.")
+            return False
+        self.set_screenshot_area(area)
+        logging.info(f"HP bar located: {self.screenshot_area}")
+        return True
+
+    def request_colour_calibration(self, on_done=None):
+        # Sampling takes about a second, so it runs on its own thread like the auto-tune;
+        # on_done(success) is called from that thread.
+        if not self.screenshot_area:
+            logging.warning("Screenshot area not selected. Please select an area first.")
+            return False
+        if self.colour_thread and self.colour_thread.is_alive():
+            logging.info("Colour calibration is already running.")
+            return True
+        self.colour_thread = self.clock.thread(self.calibrate_colours, on_done, name="ColourCalibration", daemon=True)
+        self.colour_thread.start()
+        return True
+
+    def calibrate_colours(self, on_done=None, samples=5, interval=0.2):
+        success = False
+        try:
+            success = self.learn_colours(samples, interval)
+        except Exception as e:
+            logging.error(f"Colour calibration failed: {e}")
+        if on_done:
+            on_done(success)
+        return success
+
+    def learn_colours(self, samples, interval):
+        load_vision_stack()
+        from capture import create_capture
+        from colour_calibration import ColourCalibrator
+        detector = self.create_detector()
+        calibrator = ColourCalibrator()
+        learned = 0
+        # Its own capture, because the monitoring thread may be grabbing with the shared ones.
+        capture = create_capture(self.calibration.get('capture_backend', 'mss'))
+        try:
+            for _ in range(samples):
+                try:
+                    frame = capture.grab(self.screenshot_area)
+                except Exception as e:
+                    logging.error(f"Screenshot failed during colour calibration: {e}")
+                    continue
+                rect = detector.detect_party(frame) if self.use_party_hp_bar else detector.detect_regular(frame)
+                if rect is None:
+                    # Treat the selection itself as the labelled bar.
+                    height, width = frame.shape[:2]
+                    rect = self.last_hp_bar or (0, 0, width, height)
+                if calibrator.add_bar(frame, rect, self.use_party_hp_bar):
+                    learned += 1
+                self.clock.sleep(interval)
+        finally:
+            capture.close()
+        if not learned:
+            logging.warning("Colour calibration found no bar pixels.")
+            return False
+        colour_ranges = calibrator.fit()
+        self.calibration.update(colour_ranges=colour_ranges)
+        # get_estimator() rebuilds the detector on the monitoring thread's next sample.
+        self.colours_applied = True
+        if self.vision_process:
+            logging.info("Restart monitoring to use the calibrated colours in the vision worker.")
+        logging.info(f"Colour calibration stored for {self.calibration.key} from {learned} frames.")
+        return True
+
+    def get_estimator(self):
+        if self.colours_applied:
+            self.colours_applied = False
+            self.estimator = None
+        if self.estimator is None:
+            load_vision_stack()
+            from hp_detector import HPEstimator
+            self.estimator = HPEstimator(self.use_party_hp_bar, self.skip_unchanged(),
+                                         self.create_detector())
+        return self.estimator
+
+    def skip_unchanged(self):
+        # The config can turn skipping off; auto-tuning may also turn it off for this display.
+        return self.config_manager.get('skip_unchanged_frames', True) and self.calibration.get('skip_unchanged', True)
+
+    def needs_autotune(self):
+        if not self.config_manager.get('auto_tune', True) or not self.screenshot_area or self.calibration.key is None:
+            return False
+        tuned_area = self.calibration.get('autotune_area')
+        return tuned_area != [self.screenshot_area['width'], self.screenshot_area['height']]
+
+    def request_autotune(self, on_done=None):
+        # Tuning runs on its own thread with its own captures, so HP sampling and potion
+        # presses carry on meanwhile. on_done(success) is called from that thread.
+        if not self.screenshot_area:
+            logging.warning("Screenshot area not selected. Please select an area first.")
+            return False
+        if self.vision_process:
+            logging.info("Auto-tune applies to in-process capture; restart monitoring without the vision process.")
+            return False
+        if self.autotune_thread and self.autotune_thread.is_alive():
+            logging.info("Auto-tune is already running.")
+            return True
+        self.autotune_thread = self.clock.thread(self.autotune, on_done, name="AutoTune", daemon=True)
+        self.autotune_thread.start()
+        return True
+
+    def autotune(self, on_done=None):
+        success = False
+        try:
+            load_vision_stack()
+            from autotune import AutoTuner
+            result = AutoTuner(self.screenshot_area, self.use_party_hp_bar, self.create_detector,
+                               sleep=self.clock.sleep).run()
+            if result is not None:
+                self.calibration.update(capture_backend=result['capture_backend'],
+                                        skip_unchanged=result['skip_unchanged'],
+                                        autotune_area=result['area'], autotune_timings=result['timings'])
+                # The monitoring thread swaps its own captures and estimator between samples.
+                self.autotune_applied = True
+                logging.info(f"Auto-tune stored for {self.calibration.key}.")
+                success = True
+        except Exception as e:
+            logging.error(f"Auto-tune failed: {e}")
+        if on_done:
+            on_done(success)
+        return success
+
+    def apply_autotune(self):
+        self.autotune_applied = False
+        if self.capture_backends:
+            for backend in self.capture_backends:
+                backend.close()
+        self.capture_backends = None
+        self.estimator = None
 
-        return hp_percentage
+    def detect_hp_bar(self, screenshot):
+        return self.get_estimator().detect_hp_bar(screenshot)
+
+    def capture_frame(self):
+        if self.capture_backends is None:
+            load_vision_stack()
+            from capture import create_capture
+            primary = self.calibration.get('capture_backend', 'mss')
+            fallback = 'pyautogui' if primary == 'mss' else 'mss'
+            self.capture_backends = [create_capture(primary), create_capture(fallback)]
+        primary, fallback = self.capture_backends
+        try:
+            return primary.grab(self.screenshot_area)
+        except Exception as e:
+            logging.warning(f"{primary.name} screenshot failed: {e}")
+            return fallback.grab(self.screenshot_area)
 
     def get_hp_percentage(self):
         if not self.screenshot_area:
             logging.warning("Screenshot area not selected. Please select an area first.")
             return None
+        estimator = self.get_estimator()
 
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                with mss() as sct:
-                    screenshot = np.array(sct.grab(self.screenshot_area))
+                screenshot = self.capture_frame()
             except Exception as e:
-                logging.warning(f"mss screenshot failed (attempt {attempt + 1}): {e}")
-                try:
-                    screenshot = pyautogui.screenshot(region=(
-                        self.screenshot_area['left'],
-                        self.screenshot_area['top'],
-                        self.screenshot_area['width'],
-                        self.screenshot_area['height']
-                    ))
-                    screenshot = np.array(screenshot)
-                except Exception as e:
-                    logging.error(f"pyautogui screenshot failed (attempt {attempt + 1}): {e}")
-                    if attempt == max_retries - 1:
-                        logging.error("Max retries reached. Unable to capture screenshot.")
-                        return None
-                    time.sleep(0.1)
-                    continue
+                logging.error(f"Screenshot failed (attempt {attempt + 1}): {e}")
+                if attempt == max_retries - 1:
+                    logging.error("Max retries reached. Unable to capture screenshot.")
+                    return None
+                self.clock.sleep(0.1)
+                continue
 
+            self.last_frame = screenshot
             try:
-                hp_bar = self.detect_hp_bar(screenshot)
-                if hp_bar is None:
-                    logging.warning("HP bar not detected in the screenshot.")
+                hp_percentage = estimator.estimate(screenshot)
+                self.last_hp_bar = estimator.last_hp_bar
+                self.last_confidence = estimator.last_confidence
+                if hp_percentage is None:
                     return None
-
-                x, y, w, h = hp_bar
-                hp_bar_img = screenshot[y:y+h, x:x+w]
-
-                if self.use_party_hp_bar:
-                    hp_percentage = self.calculate_party_hp_percentage(hp_bar_img)
-                else:
-                    middle_line = h // 2
-                    hp_line = hp_bar_img[middle_line:middle_line+1, :]
-
-                    hsv = cv2.cvtColor(hp_line, cv2.COLOR_BGR2HSV)
-
-                    lower_blue = np.array([100, 30, 100])
-                    upper_blue = np.array([140, 255, 255])
-                    mask = cv2.inRange(hsv, lower_blue, upper_blue)
-                    blue_pixels = cv2.countNonZero(mask)
-
-                    if blue_pixels == 0:
-                        lower_yellow = np.array([10, 65, 15])
-                        upper_yellow = np.array([50, 185, 185])
-                        mask = cv2.inRange(hsv, lower_yellow, upper_yellow)
-                        yellow_pixels = cv2.countNonZero(mask)
-                        hp_percentage = (yellow_pixels / (w - 2)) * 100
-                    else:
-                        hp_percentage = (blue_pixels / (w - 2)) * 100
-
-                logging.info(f"Calculated HP percentage: {hp_percentage:.2f}%")
                 return hp_percentage, screenshot
 
             except Exception as e:
                 logging.error(f"Error processing HP percentage (attempt {attempt + 1}): {e}")
                 if attempt == max_retries - 1:
                     return None
-                time.sleep(0.25)
-
-    def __del__(self):
-        if hasattr(self, 'sct'):
-            self.sct.close()
+                self.clock.sleep(0.25)
 
     def start_monitoring(self):
         if not self.monitoring_thread or not self.monitoring_thread.is_alive():
+            load_vision_stack()
+            if self.calibration.refresh():
+                # Cached area, bar size, colours and tuning are all per display.
+                logging.info(f"Display changed to {self.calibration.key}.")
+                self.estimator = None
+                self.bar_size_recorded = False
+                self.load_cached_area()
+                self.capture_backends = None
+            self.get_estimator().reset()
+            self.bar_size_recorded = False
+            if self.config_manager.get('vision_process_mode', False) and self.screenshot_area:
+                self.start_vision_process()
             self.should_monitor.set()
-            self.monitoring_thread = threading.Thread(target=self.monitor_hp)
-            self.monitoring_thread.daemon = True
+            self.start_gauge_engine()
+            if self.config_manager.get('save_hp_bar_images', True):
+                self.image_writer.start()
+            self.monitoring_thread = self.clock.thread(self.monitor_hp, name="HPMonitor", daemon=True)
             self.monitoring_thread.start()
             logging.info("HP monitoring started.")
 
     def stop_monitoring(self):
         self.should_monitor.clear()
         if self.monitoring_thread and self.monitoring_thread.is_alive():
-            self.monitoring_thread.join()
+            self.clock.join(self.monitoring_thread)
+        self.image_writer.stop()
+        if self.gauge_engine:
+            self.gauge_engine.stop()
+            self.gauge_engine = None
+        if self.vision_process:
+            self.vision_process.stop()
+            self.vision_process = None
+        if self.capture_backends:
+            for backend in self.capture_backends:
+                backend.close()
+        if self.estimator and self.estimator.detector.fallback_passes:
+            logging.info(f"Yellow fallback detection passes: {self.estimator.detector.fallback_passes}")
+        frame_change = self.estimator.frame_change if self.estimator else None
+        if frame_change and frame_change.checked:
+            logging.info(f"Unchanged frames skipped: {frame_change.skipped}/{frame_change.checked} "
+                         f"({frame_change.skip_ratio:.0%})")
         logging.info("HP monitoring stopped.")
 
+    def start_gauge_engine(self):
+        entries = [entry for entry in self.config_manager.get('gauges') or [] if entry.get('enabled', True)]
+        if not entries:
+            return
+        from gauge_engine import Gauge, GaugeEngine
+        try:
+            self.gauge_engine = GaugeEngine(
+                [Gauge.from_config(entry) for entry in entries],
+                self.key_presser,
+                colour_ranges=self.calibration.get('colour_ranges')
+            )
+            self.gauge_engine.start()
+        except Exception as e:
+            logging.error(f"Unable to start gauge monitoring: {e}")
+            self.gauge_engine = None
+
+    def start_vision_process(self):
+        from vision_worker import VisionProcess
+        try:
+            self.vision_process = VisionProcess(
+                self.screenshot_area,
+                use_party_hp_bar=self.use_party_hp_bar,
+                skip_unchanged=self.skip_unchanged(),
+                colour_ranges=self.calibration.get('colour_ranges'),
+                geometry=self.detector_geometry()
+            )
+            self.vision_process.start()
+        except Exception as e:
+            logging.error(f"Falling back to in-process HP monitoring: {e}")
+            self.vision_process = None
+
+    def receive_vision_sample(self):
+        sample = self.vision_process.receive(timeout=1.0)
+        if sample is None:
+            if not self.vision_process.is_alive():
+                logging.error("Vision worker exited; falling back to in-process HP monitoring.")
+                self.vision_process.stop()
+                self.vision_process = None
+            return None
+        self.last_hp_bar = sample.rect
+        self.last_confidence = sample.confidence
+        self.last_frame = self.vision_process.frame_ref(sample)
+        if sample.hp_percentage is None:
+            return None
+        return sample.hp_percentage, self.last_frame
+
+    def next_sample(self):
+        if self.vision_process:
+            return self.receive_vision_sample()
+        start = time.perf_counter()
+        result = self.get_hp_percentage()
+        self.frame_metric.observe(time.perf_counter() - start)
+        # The worker process paces itself; in-process sampling runs every 100 ms.
+        self.clock.sleep(0.1)
+        return result
+
     def save_hp_bar_image(self, screenshot):
-        if not os.path.exists('hp_bar_images'):
-            os.makedirs('hp_bar_images')
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"hp_bar_images/hp_bar_{timestamp}.png"
-        
-        Image.fromarray(screenshot).save(filename)
-        logging.info(f"HP bar image saved: {filename}")
+        if self.config_manager.get('save_hp_bar_images', True):
+            image = screenshot.bgr
+            if image is not None:
+                self.image_writer.submit(image, self.last_hp_bar)
+
+    def create_potion_controller(self):
+        from potion_controller import PotionController
+        return PotionController(
+            self.key_presser.press_hp_key,
+            cooldown=self.config_manager.get('hp_frequency', 0.1),
+            confirm_window=self.config_manager.get('potion_confirm_window', 0.6),
+            max_retries=self.config_manager.get('potion_max_retries', 1),
+            clock=self.clock.now
+        )
 
     def monitor_hp(self):
+        potion = self.potion = self.create_potion_controller()
+        if not self.vision_process and self.needs_autotune():
+            self.request_autotune()
         while self.should_monitor.is_set():
-            result = self.get_hp_percentage()
+            if self.autotune_applied:
+                self.apply_autotune()
+            result = self.next_sample()
+            self.last_hp_percentage = result[0] if result is not None else None
+            self.last_sample_time = time.time()
+            if self.recorder:
+                if result is not None:
+                    self.recorder.record_hp(result[0], self.last_confidence, self.last_hp_bar)
+                else:
+                    self.recorder.record_hp(None, 0.0, None)
+            hp_threshold = self.config_manager.get('hp_level', 85)
             if result is not None:
                 hp_percentage, screenshot = result
+                self.remember_bar_size()
                 logging.info(f"Current HP: {hp_percentage:.2f}%")
-                
-                hp_threshold = self.config_manager.get('hp_level', 85)
-                if 1 < hp_percentage < hp_threshold:
-                    hp_key = self.config_manager.get('hp_key', '5')
-                    hp_frequency = self.config_manager.get('hp_frequency', 0.1)
-                    logging.info(f"HP below threshold ({hp_threshold}%). Pressing HP key: {hp_key}")
-                    self.key_presser.press_hp_key()
+
+                # Sampling continues through the potion cooldown; the controller paces presses.
+                self.samples_metric.inc()
+                if potion.update(hp_percentage, hp_threshold):
+                    self.potions_metric.inc()
                     self.save_hp_bar_image(screenshot)
-                    time.sleep(hp_frequency)
                 elif hp_percentage == 0:
                     logging.info("HP is 0%. Skipping HP key press.")
             else:
+                self.failures_metric.inc()
+                # Never presses without a reading; only advances confirmation and cooldown.
+                potion.update(None, hp_threshold)
                 logging.warning("Failed to get HP percentage.")
-            
-            time.sleep(0.1)
+        logging.info(potion.summary())
 
     def get_cursor_position(self):
+        load_vision_stack()
         with mss() as sct:
             return sct.position
\ No newline at end of file
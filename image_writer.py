@@ -0,0 +1,124 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from queue import Queue, Empty, Full
+
+
+class HPImageWriter:
+    def __init__(self, directory='hp_bar_images', max_pending=8, max_files=200, max_bytes=50 * 1024 * 1024,
+                 min_interval=1.0, padding=4):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.min_interval = min_interval
+        self.padding = padding
+        self.queue = Queue(maxsize=max_pending)
+        self.should_run = threading.Event()
+        self.writer_thread = None
+        self.saved_files = deque()
+        self.saved_bytes = 0
+        self.last_submit_time = 0.0
+        self.sequence = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.writer_thread and self.writer_thread.is_alive():
+            return
+        self.should_run.set()
+        self.writer_thread = threading.Thread(target=self.write_images, name="HPImageWriter")
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def stop(self):
+        self.should_run.clear()
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.writer_thread.join(timeout=2.0)
+        self.writer_thread = None
+
+    def submit(self, screenshot, hp_bar=None):
+        # Called from the monitoring thread: never blocks, never touches the disk.
+        now = time.perf_counter()
+        if now - self.last_submit_time < self.min_interval:
+            return False
+
+        roi = self.crop(screenshot, hp_bar)
+        self.sequence += 1
+        filename = f"hp_bar_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{self.sequence:04d}.png"
+        try:
+            # Copy only the cropped region so the capture buffer can be reused.
+            self.queue.put_nowait((filename, roi.copy()))
+        except Full:
+            self.dropped += 1
+            return False
+        self.last_submit_time = now
+        return True
+
+    def crop(self, screenshot, hp_bar):
+        if hp_bar is None:
+            return screenshot
+        x, y, w, h = hp_bar
+        height, width = screenshot.shape[:2]
+        top = max(0, y - self.padding)
+        left = max(0, x - self.padding)
+        bottom = min(height, y + h + self.padding)
+        right = min(width, x + w + self.padding)
+        return screenshot[top:bottom, left:right]
+
+    def write_images(self):
+        import cv2
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.load_existing_files()
+        except OSError as e:
+            logging.error(f"Unable to prepare HP image directory {self.directory}: {e}")
+            return
+
+        while self.should_run.is_set() or not self.queue.empty():
+            try:
+                filename, image = self.queue.get(timeout=0.25)
+            except Empty:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                # Level 1 keeps encoding cheap; the crops are tiny anyway.
+                if not cv2.imwrite(path, image, [cv2.IMWRITE_PNG_COMPRESSION, 1]):
+                    logging.error(f"Failed to encode HP bar image: {path}")
+                    continue
+                size = os.path.getsize(path)
+            except Exception as e:
+                logging.error(f"Failed to save HP bar image {path}: {e}")
+                continue
+            self.saved_files.append((path, size))
+            self.saved_bytes += size
+            self.enforce_quota()
+            logging.debug(f"HP bar image saved: {path}")
+
+        if self.dropped:
+            logging.info(f"HP image writer dropped {self.dropped} images while busy.")
+
+    def load_existing_files(self):
+        self.saved_files.clear()
+        self.saved_bytes = 0
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.startswith('hp_bar_') and entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        for _, path, size in sorted(entries):
+            self.saved_files.append((path, size))
+            self.saved_bytes += size
+        self.enforce_quota()
+
+    def enforce_quota(self):
+        while self.saved_files and (len(self.saved_files) > self.max_files or self.saved_bytes > self.max_bytes):
+            path, size = self.saved_files.popleft()
+            self.saved_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.warning(f"Unable to remove old HP bar image {path}: {e}")
@@ -0,0 +1,215 @@
+import time
+import ctypes
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+
+class InputBackend(ABC):
+    # Injects key and mouse events. Events may be buffered until flush(); backends
+    # with batched = True submit everything buffered in one OS call.
+    name = 'base'
+    batched = False
+
+    @abstractmethod
+    def key_down(self, key):
+        pass
+
+    @abstractmethod
+    def key_up(self, key):
+        pass
+
+    @abstractmethod
+    def click(self, button):
+        pass
+
+    def supports(self, key):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class PynputBackend(InputBackend):
+    name = 'pynput'
+
+    def __init__(self):
+        from pynput.mouse import Button, Controller as MouseController
+        from pynput.keyboard import Controller as KeyboardController, Key
+        self.keyboard = KeyboardController()
+        self.mouse = MouseController()
+        self.Key = Key
+        self.buttons = {'left': Button.left, 'right': Button.right}
+
+    def resolve(self, key):
+        if isinstance(key, str) and hasattr(self.Key, key.lower()):
+            return getattr(self.Key, key.lower())
+        return key
+
+    def supports(self, key):
+        # Single characters or pynput Key names; anything else fails in press().
+        return isinstance(key, str) and (len(key) == 1 or hasattr(self.Key, key.lower()))
+
+    def key_down(self, key):
+        self.keyboard.press(self.resolve(key))
+
+    def key_up(self, key):
+        self.keyboard.release(self.resolve(key))
+
+    def click(self, button):
+        self.mouse.click(self.buttons[button])
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [("wVk", ctypes.c_ushort), ("wScan", ctypes.c_ushort), ("dwFlags", ctypes.c_ulong),
+                ("time", ctypes.c_ulong), ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))]
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [("dx", ctypes.c_long), ("dy", ctypes.c_long), ("mouseData", ctypes.c_ulong),
+                ("dwFlags", ctypes.c_ulong), ("time", ctypes.c_ulong), ("dwExtraInfo", ctypes.POINTER(ctypes.c_ulong))]
+
+
+class INPUT_UNION(ctypes.Union):
+    _fields_ = [("ki", KEYBDINPUT), ("mi", MOUSEINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_ulong), ("union", INPUT_UNION)]
+
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+MOUSE_FLAGS = {'left': (0x0002, 0x0004), 'right': (0x0008, 0x0010)}
+# Virtual-key codes for the pynput Key names.
+VIRTUAL_KEYS = {
+    'shift': 0x10, 'shift_l': 0xA0, 'shift_r': 0xA1, 'ctrl': 0x11, 'ctrl_l': 0xA2, 'ctrl_r': 0xA3,
+    'alt': 0x12, 'alt_l': 0xA4, 'alt_r': 0xA5, 'alt_gr': 0xA5, 'cmd': 0x5B, 'cmd_l': 0x5B, 'cmd_r': 0x5C,
+    'space': 0x20, 'enter': 0x0D, 'tab': 0x09, 'esc': 0x1B, 'backspace': 0x08, 'delete': 0x2E, 'insert': 0x2D,
+    'home': 0x24, 'end': 0x23, 'page_up': 0x21, 'page_down': 0x22,
+    'up': 0x26, 'down': 0x28, 'left': 0x25, 'right': 0x27,
+    'caps_lock': 0x14, 'num_lock': 0x90, 'scroll_lock': 0x91, 'print_screen': 0x2C, 'pause': 0x13, 'menu': 0x5D,
+    **{f'f{i}': 0x6F + i for i in range(1, 25)},
+}
+
+
+class SendInputBackend(InputBackend):
+    # Buffers events and submits them with a single SendInput call per flush (Windows only).
+    name = 'sendinput'
+    batched = True
+
+    def __init__(self, capacity=64):
+        self.user32 = ctypes.windll.user32
+        self.user32.VkKeyScanW.restype = ctypes.c_short
+        self.codes = dict(VIRTUAL_KEYS)
+        self.buffer = (INPUT * capacity)()
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def virtual_key(self, key):
+        name = str(key).lower()
+        code = self.codes.get(name)
+        if code is None:
+            # VkKeyScanW returns -1 for characters the current layout cannot type.
+            scan = self.user32.VkKeyScanW(ord(name)) if len(name) == 1 else -1
+            if scan == -1:
+                raise ValueError(f"Unsupported key for SendInput: {key}")
+            code = self.codes[name] = scan & 0xFF
+        return code
+
+    def supports(self, key):
+        try:
+            self.virtual_key(key)
+        except ValueError:
+            return False
+        return True
+
+    def append(self, input_type, code, flags):
+        with self.lock:
+            if self.pending == len(self.buffer):
+                self.submit()
+            event = self.buffer[self.pending]
+            event.type = input_type
+            if input_type == INPUT_KEYBOARD:
+                event.union.ki = KEYBDINPUT(code, 0, flags, 0, None)
+            else:
+                event.union.mi = MOUSEINPUT(0, 0, 0, flags, 0, None)
+            self.pending += 1
+
+    def key_down(self, key):
+        self.append(INPUT_KEYBOARD, self.virtual_key(key), 0)
+
+    def key_up(self, key):
+        self.append(INPUT_KEYBOARD, self.virtual_key(key), KEYEVENTF_KEYUP)
+
+    def click(self, button):
+        down, up = MOUSE_FLAGS[button]
+        self.append(INPUT_MOUSE, 0, down)
+        self.append(INPUT_MOUSE, 0, up)
+
+    def submit(self):
+        if self.pending:
+            sent = self.user32.SendInput(self.pending, self.buffer, ctypes.sizeof(INPUT))
+            if sent != self.pending:
+                logging.warning(f"SendInput injected {sent} of {self.pending} events")
+            self.pending = 0
+
+    def flush(self):
+        with self.lock:
+            self.submit()
+
+
+class RecordingBackend(InputBackend):
+    # Keeps every event in memory with a timestamp instead of touching the desktop.
+    name = 'recording'
+    batched = True
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.events = []
+        self.flushes = 0
+        self.lock = threading.Lock()
+
+    def record(self, kind, value):
+        with self.lock:
+            self.events.append((self.clock(), kind, value))
+
+    def key_down(self, key):
+        self.record('key_down', key)
+
+    def key_up(self, key):
+        self.record('key_up', key)
+
+    def click(self, button):
+        self.record('click', button)
+
+    def flush(self):
+        with self.lock:
+            self.flushes += 1
+
+    def counts(self):
+        counts = {}
+        for _, kind, value in self.events:
+            counts[(kind, value)] = counts.get((kind, value), 0) + 1
+        return counts
+
+
+INPUT_BACKENDS = {
+    PynputBackend.name: PynputBackend,
+    SendInputBackend.name: SendInputBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+
+def create_input_backend(name):
+    try:
+        return INPUT_BACKENDS[name]()
+    except Exception as e:
+        if name == PynputBackend.name:
+            raise
+        logging.error(f"Input backend {name} unavailable ({e}); using pynput.")
+        return PynputBackend()
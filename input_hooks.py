@@ -0,0 +1,99 @@
+import logging
+import threading
+from pynput.keyboard import Key, KeyCode, Listener
+
+
+def normalize_key(key):
+    # Accepts pynput keys or names such as 'f3', 'shift' or 'q'.
+    if not isinstance(key, str):
+        return key
+    name = key.lower()
+    if hasattr(Key, name):
+        return getattr(Key, name)
+    return KeyCode.from_char(name)
+
+
+class Subscription:
+    def __init__(self, callback, keys, on_press, on_release):
+        self.callback = callback
+        self.keys = keys
+        self.on_press = on_press
+        self.on_release = on_release
+
+
+class InputHookService:
+    # A single keyboard hook for the whole process. Subscribers register for specific
+    # keys (or every key); the hook thread looks the key up in an immutable table and
+    # returns immediately when no one is interested, without locks or queues.
+    def __init__(self, listener_factory=Listener):
+        self.listener_factory = listener_factory
+        self.listener = None
+        self.lock = threading.Lock()
+        self.by_key = {}
+        self.all_keys = ()
+
+    def subscribe(self, callback, keys=None, on_press=True, on_release=False):
+        subscription = Subscription(callback, None if keys is None else {normalize_key(k) for k in keys},
+                                    on_press, on_release)
+        with self.lock:
+            if subscription.keys is None:
+                self.all_keys = self.all_keys + (subscription,)
+            else:
+                by_key = dict(self.by_key)
+                for key in subscription.keys:
+                    by_key[key] = by_key.get(key, ()) + (subscription,)
+                self.by_key = by_key
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription.keys is None:
+                self.all_keys = tuple(s for s in self.all_keys if s is not subscription)
+                return
+            by_key = dict(self.by_key)
+            for key in subscription.keys:
+                remaining = tuple(s for s in by_key.get(key, ()) if s is not subscription)
+                if remaining:
+                    by_key[key] = remaining
+                else:
+                    by_key.pop(key, None)
+            self.by_key = by_key
+
+    def start(self):
+        if self.listener is not None:
+            return
+        self.listener = self.listener_factory(on_press=self.on_press, on_release=self.on_release)
+        self.listener.daemon = True
+        self.listener.name = "InputHook"
+        self.listener.start()
+        logging.info("Input hook started.")
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            logging.info("Input hook stopped.")
+
+    def on_press(self, key):
+        self.dispatch(key, True)
+
+    def on_release(self, key):
+        self.dispatch(key, False)
+
+    def dispatch(self, key, pressed):
+        subscribers = self.by_key.get(key)
+        if subscribers is None:
+            # Shifted letters arrive upper-case; subscriptions are stored lower-case.
+            char = getattr(key, 'char', None)
+            if char and char != char.lower():
+                subscribers = self.by_key.get(KeyCode.from_char(char.lower()), ())
+            else:
+                subscribers = ()
+        if self.all_keys:
+            subscribers = subscribers + self.all_keys
+        for subscription in subscribers:
+            if subscription.on_press if pressed else subscription.on_release:
+                try:
+                    subscription.callback(key, pressed)
+                except Exception as e:
+                    logging.error(f"Input hook subscriber failed: {e}")
@@ -1,32 +1,54 @@
 import threading
-import time
 import logging
-from pynput.mouse import Button, Controller as MouseController
-from pynput.keyboard import Controller as KeyboardController, Key, Listener, KeyCode
 from queue import Queue, Empty, PriorityQueue
+from input_backend import create_input_backend
+from clock import REAL_CLOCK
+from metrics import REGISTRY
+from rotation import Rotation, legacy_slots, legacy_rotation, rotation_actions
 
 class PrioritizedItem:
-    def __init__(self, priority, action_type, action):
+    def __init__(self, priority, action_type, action, enqueued_at):
         self.priority = priority
         self.action_type = action_type
         self.action = action
+        self.enqueued_at = enqueued_at
 
     def __lt__(self, other):
         return self.priority < other.priority
 
 class KeyPresser:
-    def __init__(self, config, config_manager):
+    def __init__(self, config, config_manager, recorder=None, input_hooks=None, input_backend=None, clock=None):
         self.config_manager = config_manager
-        self.mouse_controller = MouseController()
-        self.keyboard_controller = KeyboardController()
+        self.clock = clock or REAL_CLOCK
+        self.recorder = recorder
+        self.input_hooks = input_hooks
+        self.manual_key_subscription = None
+        self.input = input_backend or create_input_backend(config_manager.get('input_backend', 'pynput'))
+        self.key_hold = 0.05
+        self.key_holds = {}
+        self.key_support = {}
+        self.rotation = None
+        self.hp_source = None
+        self.batch_limit = 8
+        self.max_queue_delay = 0.0
         self.should_press = threading.Event()
         self.is_paused = threading.Event()
+        self.resumed = threading.Event()
+        self.resumed.set()
         self.lock = threading.Lock()
         self.threads = []
-        self.manual_key_thread = None
         self.manual_keys_pressed = set()
         self.key_press_queue = PriorityQueue()
+        self.pending_actions = set()
+        self.carried_action = None
+        self.coalesced_actions = 0
         self.hp_key_press_queue = Queue()
+        self.work_available = threading.Event()
+        self.actions_metric = REGISTRY.counter("actions", "Key presses and clicks injected.")
+        self.coalesced_metric = REGISTRY.counter("actions_coalesced", "Scheduled actions skipped because the same action was still queued.")
+        self.queue_delay_metric = REGISTRY.histogram("action_queue_delay_seconds", "Time actions waited before injection.")
+        REGISTRY.gauge("action_queue_depth", "Actions waiting to be injected.",
+                       lambda: self.key_press_queue.qsize() + self.hp_key_press_queue.qsize())
         self.key_press_thread = None
         self.shift_thread = None
         self.config = config
@@ -39,6 +61,7 @@ class KeyPresser:
             self.start_pressing()
 
     def start_pressing(self):
+        self.join_threads(1.0)
         self.should_press.set()
         logging.debug(f"Left click var: {self.config_manager.get('left_click_var')}")
         logging.debug(f"Right click var: {self.config_manager.get('right_click_var')}")
@@ -46,45 +69,87 @@ class KeyPresser:
         logging.debug(f"Right click freq: {self.config_manager.get('right_click_freq')}")
         logging.debug(f"Hold shift key: {self.config_manager.get('hold_shift_key')}")
 
-        self.key_press_thread = threading.Thread(target=self.process_key_press_queue)
+        self.key_press_thread = self.clock.thread(self.process_key_press_queue, name="KeyDispatch")
         self.key_press_thread.start()
         self.threads.append(self.key_press_thread)
 
-        for i in range(4):
-            thread = threading.Thread(target=self.schedule_key_press, args=(i,))
-            thread.start()
-            self.threads.append(thread)
+        self.rotation = Rotation(self.usable_actions(rotation_actions(self.config_manager)))
+        self.key_holds = self.rotation.holds
+        rotation_thread = self.clock.thread(self.run_rotation, name="Rotation")
+        rotation_thread.start()
+        self.threads.append(rotation_thread)
 
         if self.config_manager.get('left_click_var'):
-            left_click_thread = threading.Thread(target=self.schedule_mouse_click, args=('left', self.config_manager.get('left_click_freq')))
+            left_click_thread = self.clock.thread(self.schedule_mouse_click, 'left', self.config_manager.get('left_click_freq'),
+                                                 name="MouseSchedule-left")
             left_click_thread.start()
             self.threads.append(left_click_thread)
 
         if self.config_manager.get('right_click_var'):
-            right_click_thread = threading.Thread(target=self.schedule_mouse_click, args=('right', self.config_manager.get('right_click_freq')))
+            right_click_thread = self.clock.thread(self.schedule_mouse_click, 'right', self.config_manager.get('right_click_freq'),
+                                                  name="MouseSchedule-right")
             right_click_thread.start()
             self.threads.append(right_click_thread)
 
-        self.manual_key_thread = threading.Thread(target=self.handle_manual_keys)
-        self.manual_key_thread.start()
-        self.threads.append(self.manual_key_thread)
+        self.track_manual_keys()
 
         if self.config_manager.get('hold_shift_key'):
-            self.shift_thread = threading.Thread(target=self.hold_shift_key)
+            self.shift_thread = self.clock.thread(self.hold_shift_key, name="ShiftHold")
             self.shift_thread.start()
             self.threads.append(self.shift_thread)
 
     def stop_pressing(self):
         self.should_press.clear()
+        self.clock.notify()
         logging.info("Stopping all key pressing operations.")
+        self.join_threads(0.1)  # Wait for a short time for threads to finish
+        if self.manual_key_subscription:
+            self.input_hooks.unsubscribe(self.manual_key_subscription)
+            self.manual_key_subscription = None
+        self.manual_keys_pressed.clear()
+        self.clear_queues()
+        self.release_shift()
+        self.is_paused.clear()
+        self.resumed.set()
+
+    def join_threads(self, timeout):
+        # Threads still busy after the timeout are kept so the next start waits for them
+        # instead of leaving them running alongside the new ones.
         for thread in self.threads:
             if thread.is_alive():
-                thread.join(timeout=0.1)  # Wait for a short time for threads to finish
-        self.threads.clear()
+                self.clock.join(thread, timeout=timeout)
+        self.threads = [thread for thread in self.threads if thread.is_alive()]
+        if self.threads:
+            logging.warning(f"{len(self.threads)} key presser threads still running after stop.")
+
+    def pause(self):
+        # Threads stay alive and park on `resumed`, so resuming is instant.
+        if self.is_paused.is_set():
+            return
+        self.resumed.clear()
+        self.is_paused.set()
+        self.clock.notify()
         self.clear_queues()
-        self.keyboard_controller.release(Key.shift)
+        self.release_shift()
+        logging.info("Key pressing paused.")
+
+    def resume(self):
+        if not self.is_paused.is_set():
+            return
+        self.is_paused.clear()
+        self.resumed.set()
+        self.clock.notify()
+        logging.info("Key pressing resumed.")
+
+    def wait_while_paused(self):
+        while self.is_paused.is_set() and self.should_press.is_set():
+            self.clock.wait(self.resumed, 0.1)
+        return self.should_press.is_set()
 
     def clear_queues(self):
+        with self.lock:
+            self.pending_actions.clear()
+            self.carried_action = None
         while not self.key_press_queue.empty():
             try:
                 self.key_press_queue.get_nowait()
@@ -99,97 +164,197 @@ class KeyPresser:
     def should_continue(self):
         return self.should_press.is_set() and not self.is_paused.is_set()
 
-    def schedule_key_press(self, index):
-        while self.should_continue():
-            key = self.config_manager.get(f'key_to_press_{index}')
-            if not key:
-                time.sleep(0.1)
-                continue
-
-            frequency = self.config_manager.get(f'frequency_{index}')
-            self.key_press_queue.put(PrioritizedItem(1, 'key', key))  # Use priority 1 for normal keys
-            
-            # Sleep in small increments to allow for quicker stopping
-            start_time = time.perf_counter()
-            while time.perf_counter() - start_time < frequency and self.should_continue():
-                time.sleep(0.01)
+    def enqueue(self, action_type, action, priority=1):
+        # A scheduler firing again before its last action was dispatched would only grow
+        # the backlog, so at most one copy of each action waits in the queue.
+        with self.lock:
+            if (action_type, action) in self.pending_actions:
+                self.coalesced_actions += 1
+                self.coalesced_metric.inc()
+                return
+            self.pending_actions.add((action_type, action))
+        self.key_press_queue.put(PrioritizedItem(priority, action_type, action, self.clock.now()))  # HP keys use their own queue ahead of these
+        self.work_available.set()
+        self.clock.notify()
+
+    def run_rotation(self):
+        # One scheduler for every key action. Without a configured rotation the four legacy
+        # slots are converted, and edited slots take effect without a restart as before.
+        legacy = not self.config_manager.get('rotation')
+        slots = legacy_slots(self.config_manager) if legacy else None
+        while self.wait_while_paused():
+            if legacy and legacy_slots(self.config_manager) != slots:
+                slots = legacy_slots(self.config_manager)
+                self.rotation = Rotation(self.usable_actions(legacy_rotation(slots)))
+                self.key_holds = self.rotation.holds
+                self.track_manual_keys()
+            rotation = self.rotation
+            now = self.clock.now()
+            hp = self.hp_source() if self.hp_source else None
+            for index in rotation.ready(now, hp):
+                self.enqueue('key', rotation.keys[index], 1 + int(rotation.priority[index]))
+                rotation.mark(index, now)
+            # Wakes early on stop or pause
+            self.clock.sleep_until(rotation.next_wake(now), self.should_continue)
+
+    def key_supported(self, key):
+        # Checked once per key, before anything is buffered, so an unsendable key is reported
+        # once instead of failing a batch on every tick.
+        if key not in self.key_support:
+            self.key_support[key] = self.input.supports(key)
+            if not self.key_support[key]:
+                logging.error(f"The {self.input.name} input backend cannot send key {key!r}; it will be skipped.")
+        return self.key_support[key]
+
+    def usable_actions(self, actions):
+        return [entry for entry in actions if not entry.get('key') or self.key_supported(str(entry['key']))]
 
     def schedule_mouse_click(self, button, frequency):
-        next_click_time = time.perf_counter()
-        while self.should_continue():
-            current_time = time.perf_counter()
+        next_click_time = self.clock.now()
+        while self.wait_while_paused():
+            current_time = self.clock.now()
             if current_time >= next_click_time:
-                self.key_press_queue.put(PrioritizedItem(1, 'mouse', button))  # Use priority 1 for mouse clicks
+                self.enqueue('mouse', button)
                 next_click_time = current_time + frequency
             else:
-                time.sleep(0.01)
+                self.clock.sleep_until(next_click_time, self.should_continue)
+
+    def next_ready_action(self):
+        # An action held back from the last batch goes first, then HP presses, then the
+        # main queue; returns (action_type, action, enqueued_at).
+        with self.lock:
+            carried, self.carried_action = self.carried_action, None
+        if carried:
+            return carried
+        try:
+            return self.hp_key_press_queue.get_nowait()
+        except Empty:
+            item = self.key_press_queue.get_nowait()
+            with self.lock:
+                self.pending_actions.discard((item.action_type, item.action))
+            return item.action_type, item.action, item.enqueued_at
 
     def process_key_press_queue(self):
-        while self.should_continue():
+        while self.wait_while_paused():
             try:
-                # First, check the HP key press queue
+                # Either queue wakes the dispatcher; the flag is cleared before draining so
+                # nothing enqueued meanwhile is missed.
+                self.work_available.clear()
                 try:
-                    action_type, action = self.hp_key_press_queue.get_nowait()
-                    self.process_action(action_type, action)
+                    actions = [self.next_ready_action()]
                 except Empty:
-                    # If no HP key press, process from the main queue
-                    item = self.key_press_queue.get(timeout=0.1)
-                    self.process_action(item.action_type, item.action)
+                    self.clock.wait(self.work_available, 0.1)
+                    continue
+                # A batching backend takes everything already queued in one submission,
+                # so several keys share a single hold instead of queueing behind each other.
+                if self.input.batched:
+                    keys = {actions[0][1]} if actions[0][0] == 'key' else set()
+                    while len(actions) < self.batch_limit:
+                        try:
+                            action = self.next_ready_action()
+                        except Empty:
+                            break
+                        if action[0] == 'key':
+                            if action[1] in keys:
+                                # Sharing one hold would merge both presses into one, so the
+                                # repeat waits for the next batch.
+                                with self.lock:
+                                    self.carried_action = action
+                                break
+                            keys.add(action[1])
+                        actions.append(action)
+                self.process_actions(actions)
             except Empty:
                 pass
             except Exception as e:
                 logging.error(f"Error processing action: {e}")
 
-    def process_action(self, action_type, action):
+    def process_action(self, action_type, action, queue_delay=0.0):
+        self.process_actions([(action_type, action, self.clock.now() - queue_delay)])
+
+    def process_actions(self, actions):
+        now = self.clock.now()
+        for action_type, action, enqueued_at in actions:
+            self.max_queue_delay = max(self.max_queue_delay, now - enqueued_at)
+            self.actions_metric.inc()
+            self.queue_delay_metric.observe(now - enqueued_at)
+            if self.recorder:
+                self.recorder.record_action(action_type, action, now - enqueued_at)
+        keys = []
+        # The lock is not held across the hold so shift handling never waits on it.
         with self.lock:
-            if action_type == 'key':
-                if isinstance(action, str) and hasattr(Key, action.lower()):
-                    key_obj = getattr(Key, action.lower())
-                else:
-                    key_obj = action
-                self.keyboard_controller.press(key_obj)
-                time.sleep(0.05)
-                self.keyboard_controller.release(key_obj)
-            elif action_type == 'mouse':
-                if action == 'left':
-                    self.mouse_controller.click(Button.left)
-                elif action == 'right':
-                    self.mouse_controller.click(Button.right)
-
-    def handle_manual_keys(self):
-        def on_press(key):
-            if not self.should_continue():
-                return False
-            if key not in self.manual_keys_pressed:
-                self.manual_keys_pressed.add(key)
-                self.key_press_queue.put(PrioritizedItem(1, 'manual_press', key))  # Use priority 1 for manual keys
-
-        def on_release(key):
-            if not self.should_continue():
-                return False
-            if key in self.manual_keys_pressed:
-                self.manual_keys_pressed.remove(key)
-                self.key_press_queue.put(PrioritizedItem(1, 'manual_release', key))  # Use priority 1 for manual keys
-
-        with Listener(on_press=on_press, on_release=on_release) as listener:
-            listener.join()
+            try:
+                for action_type, action, _ in actions:
+                    if action_type == 'key':
+                        self.input.key_down(action)
+                        keys.append(action)
+                    elif action_type == 'mouse':
+                        self.input.click(action)
+                self.input.flush()
+            except Exception:
+                # Buffered downs must never go out without their ups, or the keys stick.
+                for key in keys:
+                    self.input.key_up(key)
+                self.input.flush()
+                raise
+        if keys:
+            self.clock.sleep(max(self.key_holds.get(key, self.key_hold) for key in keys))
+            with self.lock:
+                for key in keys:
+                    self.input.key_up(key)
+                self.input.flush()
+
+    def track_manual_keys(self):
+        # Only the keys this presser sends are watched; everything else stays in the hook.
+        if not self.input_hooks:
+            return
+        if self.manual_key_subscription:
+            self.input_hooks.unsubscribe(self.manual_key_subscription)
+            self.manual_key_subscription = None
+        keys = list(self.rotation.keys if self.rotation else []) + [self.config_manager.get('hp_key')]
+        keys = [key for key in keys if key]
+        if keys:
+            self.manual_key_subscription = self.input_hooks.subscribe(
+                self.on_manual_key, keys, on_press=True, on_release=True)
+
+    def on_manual_key(self, key, pressed):
+        if self.is_paused.is_set():
+            return
+        if pressed:
+            self.manual_keys_pressed.add(key)
+        else:
+            self.manual_keys_pressed.discard(key)
 
     def press_hp_key(self):
+        # Never blocks; pacing between presses is up to the caller (see PotionController).
         hp_key = self.config_manager.get('hp_key')
-        hp_frequency = self.config_manager.get('hp_frequency', 0.1)
         if not hp_key:
             logging.warning("HP key is not set.")
-            return
+            return False
+        return self.press_priority_key(hp_key)
 
-        self.hp_key_press_queue.put(('key', hp_key))
-        time.sleep(hp_frequency)
+    def press_priority_key(self, key):
+        # Jumps ahead of the scheduled keys; used for HP and gauge triggered presses.
+        if self.is_paused.is_set() or not self.key_supported(key):
+            return False
+        self.hp_key_press_queue.put(('key', key, self.clock.now()))
+        self.work_available.set()
+        self.clock.notify()
+        return True
 
     def hold_shift_key(self):
-        while self.should_continue():
+        while self.wait_while_paused():
             if self.config_manager.get('hold_shift_key'):
-                self.keyboard_controller.press(Key.shift)
+                with self.lock:
+                    self.input.key_down('shift')
+                    self.input.flush()
                 while self.should_continue() and self.config_manager.get('hold_shift_key'):
-                    time.sleep(0.1)
-                self.keyboard_controller.release(Key.shift)
+                    self.clock.sleep(0.1)
+                self.release_shift()
             else:
-                time.sleep(0.1)
\ No newline at end of file
+                self.clock.sleep(0.1)
+
+    def release_shift(self):
+        with self.lock:
+            self.input.key_up('shift')
+            self.input.flush()
@@ -1,67 +1,103 @@
-import dearpygui.dearpygui as dpg
-import pywinstyles
-from gui import GUI
-from hp_monitor import HPMonitor
-from key_presser import KeyPresser
-from config_manager import ConfigManager
+from startup_timer import StartupTimer
 import logging
-import time
 import traceback
 import sys
 import ctypes
+import multiprocessing
+
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    # Headless mode runs the daemon and never loads DearPyGui.
+    multiprocessing.freeze_support()
+    from daemon import main as daemon_main
+    sys.exit(daemon_main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+
+startup_timer = StartupTimer()
+with startup_timer.phase("import dearpygui"):
+    import dearpygui.dearpygui as dpg
+with startup_timer.phase("import pywinstyles"):
+    import pywinstyles
+with startup_timer.phase("import gui"):
+    from gui import GUI
+with startup_timer.phase("import hp_monitor"):
+    from hp_monitor import HPMonitor
+with startup_timer.phase("import key_presser"):
+    from key_presser import KeyPresser
+with startup_timer.phase("import config/recorder"):
+    from config_manager import ConfigManager
+    from session_recorder import SessionRecorder
+    from render_scheduler import RenderScheduler
+    from input_hooks import InputHookService
+    from profiler import ThreadProfiler
+    from metrics import start_metrics_export
+    from display_geometry import display_scaling_factor
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class ZXOneButton:
     def __init__(self):
         try:
-            self.config_manager = ConfigManager()
-            self.key_presser = KeyPresser(self.config_manager.config, self.config_manager)
-            self.scaling_factor = self.get_display_scaling_factor()
-            self.hp_monitor = HPMonitor(self.config_manager, self.key_presser, self.scaling_factor)
-            self.gui = GUI(self.config_manager, self.hp_monitor, self.key_presser)
-            self.target_fps = 60
-            self.frame_time = 1.0 / self.target_fps
+            with startup_timer.phase("init config"):
+                self.config_manager = ConfigManager()
+                self.recorder = SessionRecorder() if self.config_manager.get('record_session', False) else None
+            with startup_timer.phase("init DPI"):
+                self.scaling_factor = display_scaling_factor()
+            with startup_timer.phase("init key presser"):
+                # One keyboard hook shared by the GUI hotkeys and the key presser.
+                self.input_hooks = InputHookService()
+                self.key_presser = KeyPresser(self.config_manager.config, self.config_manager, self.recorder,
+                                              self.input_hooks)
+            with startup_timer.phase("init HP monitor"):
+                self.hp_monitor = HPMonitor(self.config_manager, self.key_presser, self.scaling_factor, self.recorder)
+            self.profiler = ThreadProfiler(window=self.config_manager.get('profiler_window', 10.0))
+            if self.config_manager.get('profiler_enabled', False):
+                self.profiler.start()
+            self.metrics_exporters = start_metrics_export(self.config_manager)
+            self.viewport_hwnd = None
+            self.render_scheduler = RenderScheduler(
+                active_fps=self.config_manager.get('render_fps', 60),
+                idle_fps=self.config_manager.get('idle_render_fps', 5),
+                is_focused=self.is_viewport_focused
+            )
+            self.gui = GUI(self.config_manager, self.hp_monitor, self.key_presser, self.render_scheduler,
+                           scaling_factor=self.scaling_factor, input_hooks=self.input_hooks,
+                           profiler=self.profiler)
         except Exception as e:
             logging.error(f"Error during initialization: {e}")
             logging.error(traceback.format_exc())
             raise
 
-    def get_display_scaling_factor(self):
+    def is_viewport_focused(self):
         try:
             user32 = ctypes.windll.user32
-            user32.SetProcessDPIAware()
-            return user32.GetDpiForSystem() / 96.0
-        except Exception as e:
-            logging.error(f"Failed to get display scaling factor: {e}")
-            return 1.0
+            if not self.viewport_hwnd:
+                self.viewport_hwnd = user32.FindWindowW(None, "ZXOneButton")
+            return user32.GetForegroundWindow() == self.viewport_hwnd
+        except Exception:
+            # Without a way to tell, never throttle.
+            return True
 
     def run(self):
         try:
             logging.info("Starting application...")
             logging.info(f"Display scaling factor: {self.scaling_factor}")
-            dpg.create_context()
+            with startup_timer.phase("create context"):
+                dpg.create_context()
             logging.info("DearPyGui context created")
-            
-            self.gui.setup()
+
+            with startup_timer.phase("GUI setup"):
+                self.gui.setup()
             logging.info("GUI setup complete")
-            dpg.setup_dearpygui()
+            with startup_timer.phase("DearPyGui setup"):
+                dpg.setup_dearpygui()
             logging.info("DearPyGui setup complete")
-            
-            dpg.show_viewport()
+
+            with startup_timer.phase("show viewport"):
+                dpg.show_viewport()
+                pywinstyles.apply_style(self, "acrylic")
             logging.info("Viewport shown")
-            pywinstyles.apply_style(self, "acrylic")
-            
-            last_time = time.perf_counter()
-            while dpg.is_dearpygui_running():
-                current_time = time.perf_counter()
-                delta_time = current_time - last_time
-                
-                if delta_time >= self.frame_time:
-                    dpg.render_dearpygui_frame()
-                    last_time = current_time
-                else:
-                    time.sleep(self.frame_time - delta_time)
+
+            self.render_scheduler.run(dpg.render_dearpygui_frame, dpg.is_dearpygui_running,
+                                      on_first_frame=startup_timer.report)
 
         except Exception as e:
             logging.error(f"An error occurred while running the application: {e}")
@@ -78,8 +114,14 @@ class ZXOneButton:
                 self.hp_monitor.stop_monitoring()
             if hasattr(self, 'gui'):
                 self.gui.cleanup()
+            if hasattr(self, 'profiler'):
+                self.profiler.stop()
+            for exporter in getattr(self, 'metrics_exporters', []):
+                exporter.stop()
             if hasattr(self, 'config_manager'):
                 self.config_manager.cleanup()
+            if getattr(self, 'recorder', None):
+                self.recorder.close()
             dpg.destroy_context()
             logging.info("Application shutdown complete.")
         except Exception as e:
@@ -87,6 +129,7 @@ class ZXOneButton:
             logging.error(traceback.format_exc())
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     try:
         app = ZXOneButton()
         app.run()
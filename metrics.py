@@ -0,0 +1,231 @@
+import os
+import math
+import logging
+import itertools
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def format_value(value):
+    # OpenMetrics spells the special values NaN, +Inf and -Inf.
+    if isinstance(value, float) and not math.isfinite(value):
+        return "NaN" if math.isnan(value) else ("+Inf" if value > 0 else "-Inf")
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    # inc() is a single next() on an itertools.count, which is atomic under the GIL, so
+    # hot paths can count without a lock. Reads are rare and each one consumes a step.
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.counter = itertools.count()
+        self.reads = 0
+        self.lock = threading.Lock()
+
+    def inc(self):
+        next(self.counter)
+
+    @property
+    def value(self):
+        with self.lock:
+            value = next(self.counter) - self.reads
+            self.reads += 1
+        return value
+
+    def samples(self):
+        yield f"{self.name}_total", "", self.value
+
+
+class Gauge:
+    # Either set() from the owning thread or computed by a function at scrape time.
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help = help_text
+        self.function = function
+        self.current = 0
+
+    def set(self, value):
+        self.current = value
+
+    @property
+    def value(self):
+        if self.function is None:
+            return self.current
+        try:
+            return self.function()
+        except Exception:
+            return float('nan')
+
+    def samples(self):
+        yield self.name, "", self.value
+
+
+class Histogram:
+    # One atomic count per bucket; the running sum is a plain float add, which is exact
+    # as long as each histogram is observed from one thread, as all of ours are.
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.bounds = tuple(sorted(buckets))
+        self.buckets = [Counter(name, help_text) for _ in range(len(self.bounds) + 1)]
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect_left(self.bounds, value)].inc()
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, bucket in zip(self.bounds + (float('inf'),), self.buckets):
+            cumulative += bucket.value
+            yield f"{self.name}_bucket", f'{{le="{format_value(float(bound))}"}}', cumulative
+        yield f"{self.name}_sum", "", self.sum
+        yield f"{self.name}_count", "", cumulative
+
+
+class MetricsRegistry:
+    # Metrics are created once by name and shared, so every instance of a class records
+    # into the same series.
+    def __init__(self, prefix="zx_"):
+        self.prefix = prefix
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def get_or_create(self, cls, name, help_text, *args):
+        name = self.prefix + name
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, *args)
+            return metric
+
+    def counter(self, name, help_text):
+        return self.get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text, function=None):
+        gauge = self.get_or_create(Gauge, name, help_text)
+        if function is not None:
+            gauge.function = function  # the most recently created owner reports
+        return gauge
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.get_or_create(Histogram, name, help_text, buckets)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    # Serves /metrics on localhost only.
+    def __init__(self, registry=REGISTRY, port=9464):
+        self.registry = registry
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+        self.thread.start()
+        logging.info(f"Metrics available at http://127.0.0.1:{self.port}/metrics")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+class MetricsTextfile:
+    # Rewrites the file every interval; the rename keeps readers from seeing partial output.
+    def __init__(self, path, registry=REGISTRY, interval=15.0):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self.stop_requested = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_requested.clear()
+        self.thread = threading.Thread(target=self.run, name="MetricsTextfile", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        self.write()
+        while not self.stop_requested.wait(self.interval):
+            self.write()
+        self.write()
+
+    def write(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(self.registry.render())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Failed to write metrics to {self.path}: {e}")
+
+    def stop(self):
+        self.stop_requested.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+
+def start_metrics_export(config_manager, registry=REGISTRY):
+    # Returns the started exporters; each has stop().
+    exporters = []
+    port = config_manager.get('metrics_port', 0)
+    if port:
+        server = MetricsServer(registry, port)
+        try:
+            server.start()
+            exporters.append(server)
+        except OSError as e:
+            logging.error(f"Unable to serve metrics on port {port}: {e}")
+    path = config_manager.get('metrics_textfile', '')
+    if path:
+        textfile = MetricsTextfile(path, registry, config_manager.get('metrics_interval', 15.0))
+        textfile.start()
+        exporters.append(textfile)
+    return exporters
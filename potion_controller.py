@@ -0,0 +1,73 @@
+import time
+import logging
+
+
+class PotionController:
+    # Decides when to press the HP key without ever blocking the sampling loop.
+    # After a press it watches for HP to rise within confirm_window; a confirmed
+    # potion starts the cooldown, a press that changed nothing may be retried.
+    READY = 'ready'
+    AWAITING_RISE = 'awaiting_rise'
+    COOLDOWN = 'cooldown'
+
+    def __init__(self, press, cooldown=0.1, confirm_window=0.6, max_retries=1, rise_threshold=1.0,
+                 clock=time.perf_counter):
+        self.press = press
+        self.cooldown = cooldown
+        self.confirm_window = confirm_window
+        self.max_retries = max_retries
+        self.rise_threshold = rise_threshold
+        self.clock = clock
+        self.state = self.READY
+        self.pressed_at = 0.0
+        self.hp_at_press = None
+        self.cooldown_until = 0.0
+        self.retries = 0
+        self.presses = 0
+        self.confirmed = 0
+        self.failed = 0
+
+    def update(self, hp_percentage, threshold, now=None):
+        # Returns True when this sample caused a press.
+        now = self.clock() if now is None else now
+
+        if self.state == self.AWAITING_RISE:
+            if hp_percentage is not None and hp_percentage >= self.hp_at_press + self.rise_threshold:
+                self.confirmed += 1
+                self.retries = 0
+                self.enter_cooldown()
+            elif now - self.pressed_at >= self.confirm_window:
+                self.failed += 1
+                if self.retries < self.max_retries:
+                    self.retries += 1
+                    self.state = self.READY
+                    logging.info(f"No HP rise after pressing the HP key; retrying ({self.retries}/{self.max_retries}).")
+                else:
+                    self.retries = 0
+                    self.enter_cooldown()
+                    logging.warning("No HP rise after pressing the HP key; waiting for the cooldown.")
+
+        if self.state == self.COOLDOWN and now >= self.cooldown_until:
+            self.state = self.READY
+
+        if self.state != self.READY or hp_percentage is None or not 1 < hp_percentage < threshold:
+            return False
+        if not self.press():
+            return False
+        logging.info(f"HP below threshold ({threshold}%). Pressed HP key at {hp_percentage:.1f}%.")
+        self.presses += 1
+        self.pressed_at = now
+        self.hp_at_press = hp_percentage
+        self.state = self.AWAITING_RISE
+        return True
+
+    def enter_cooldown(self):
+        self.state = self.COOLDOWN
+        self.cooldown_until = self.pressed_at + self.cooldown
+
+    def reset(self):
+        self.state = self.READY
+        self.retries = 0
+
+    def summary(self):
+        return f"HP key presses: {self.presses}, confirmed: {self.confirmed}, no effect: {self.failed}"
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+from thread_cpu import thread_cpu_time, thread_cpu_times
+
+
+class ThreadProfiler:
+    # Samples thread stacks every interval and, once per window, reports per-thread CPU
+    # time and the hottest functions. OS thread CPU counters only advance every 10-16 ms,
+    # so CPU is read every cpu_interval instead and each thread's CPU over that span is
+    # shared between the stacks sampled in it. Blocked threads get no weight, so waits
+    # do not drown out real work. Nothing runs while it is stopped.
+    def __init__(self, interval=0.01, window=10.0, top=15, directory='profiler_snapshots', cpu_interval=0.1):
+        self.interval = interval
+        self.cpu_interval = max(cpu_interval, interval)
+        self.window = window
+        self.top = top
+        self.directory = directory
+        self.should_run = threading.Event()
+        self.thread = None
+        self.last_report = None
+        self.reset_cpu()
+        self.reset_window()
+
+    @property
+    def enabled(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def set_enabled(self, enabled):
+        if enabled:
+            self.start()
+        else:
+            self.stop()
+
+    def start(self):
+        if self.enabled:
+            return
+        self.should_run.set()
+        self.thread = threading.Thread(target=self.run, name="Profiler", daemon=True)
+        self.thread.start()
+        logging.info(f"Profiler started ({self.interval * 1000:.0f} ms samples, {self.window:.0f} s windows).")
+
+    def stop(self):
+        self.should_run.clear()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+        self.thread = None
+
+    def reset_cpu(self):
+        # Kept across windows so the first CPU read of a window already has a baseline.
+        self.pending = {}
+        self.last_cpu = {}
+        self.last_cpu_read = time.perf_counter()
+
+    def reset_window(self):
+        self.samples = 0
+        self.busy_samples = 0
+        self.busy_weight = 0.0
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.thread_counts = Counter()
+        self.window_start = time.perf_counter()
+        self.cpu_start = thread_cpu_times()
+
+    def run(self):
+        self.reset_cpu()
+        self.reset_window()
+        own_ident = threading.get_ident()
+        while self.should_run.is_set():
+            self.sample(own_ident)
+            if time.perf_counter() - self.window_start >= self.window:
+                self.report()
+            time.sleep(self.interval)
+        if self.busy_samples:
+            self.report()
+        logging.info("Profiler stopped.")
+
+    def sample(self, own_ident):
+        frames = sys._current_frames()
+        threads = []
+        for thread in threading.enumerate():
+            frame = frames.get(thread.ident)
+            if thread.ident == own_ident or frame is None:
+                continue
+            threads.append(thread)
+            code = frame.f_code
+            line = (code.co_filename, frame.f_lineno, code.co_name)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                if key not in stack:
+                    stack.append(key)
+                frame = frame.f_back
+            self.pending.setdefault(thread.ident, []).append((line, stack))
+        self.samples += 1
+        if time.perf_counter() - self.last_cpu_read >= self.cpu_interval:
+            self.attribute_cpu(threads)
+
+    def attribute_cpu(self, threads):
+        self.last_cpu_read = time.perf_counter()
+        last_cpu = {}
+        for thread in threads:
+            cpu = last_cpu[thread.ident] = thread_cpu_time(thread)
+            pending = self.pending.pop(thread.ident, None)
+            previous = self.last_cpu.get(thread.ident)
+            if not pending or (cpu is not None and previous is None):
+                continue
+            # Without a CPU clock every sample counts one interval.
+            used = len(pending) * self.interval if cpu is None else cpu - previous
+            if used <= 0:
+                continue
+            weight = used / len(pending)
+            name = thread.name
+            self.busy_samples += len(pending)
+            self.busy_weight += used
+            self.thread_counts[name] += len(pending)
+            for line, stack in pending:
+                self.self_counts[(name, *line)] += weight
+                for key in stack:
+                    self.total_counts[key] += weight
+        self.pending.clear()
+        self.last_cpu = last_cpu
+
+    def report(self):
+        elapsed = time.perf_counter() - self.window_start
+        cpu_end = thread_cpu_times()
+        threads = {}
+        for name, seconds in cpu_end.items():
+            used = seconds - self.cpu_start.get(name, 0.0)
+            threads[name] = {
+                "cpu_s": used,
+                "cpu_percent": used / elapsed * 100 if elapsed > 0 else 0.0,
+                "samples": self.thread_counts.get(name, 0),
+            }
+        busy = self.busy_weight or 1.0
+        self.last_report = {
+            "time": datetime.now().isoformat(timespec='seconds'),
+            "window_s": elapsed,
+            "samples": self.samples,
+            "busy_samples": self.busy_samples,
+            "threads": dict(sorted(threads.items(), key=lambda item: -item[1]["cpu_s"])),
+            # Lines running when sampled, as a share of the CPU attributed to sampled stacks.
+            "hot_lines": [
+                {"thread": name, "function": function, "where": f"{os.path.basename(path)}:{line}",
+                 "share": count / busy}
+                for (name, path, line, function), count in self.self_counts.most_common(self.top)
+            ],
+            # Functions anywhere on a stack, so callers of hot code show up too.
+            "hot_functions": [
+                {"function": function, "where": f"{os.path.basename(path)}:{line}", "share": count / busy}
+                for (path, line, function), count in self.total_counts.most_common(self.top)
+            ],
+        }
+        logging.info(f"Profiler window {elapsed:.1f}s: {self.busiest()}")
+        self.write_snapshot(self.last_report)
+        self.reset_window()
+
+    def write_snapshot(self, report):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=4)
+        except OSError as e:
+            logging.error(f"Failed to write profiler snapshot: {e}")
+
+    def busiest(self, count=3):
+        if not self.last_report:
+            return "collecting..."
+        return ", ".join(f"{name} {stats['cpu_percent']:.1f}%"
+                         for name, stats in list(self.last_report["threads"].items())[:count])
@@ -0,0 +1,70 @@
+import time
+import threading
+from metrics import REGISTRY
+
+
+class RenderScheduler:
+    def __init__(self, active_fps=60, idle_fps=5, idle_delay=1.0, is_focused=None):
+        self.active_interval = 1.0 / max(1, active_fps)
+        self.idle_interval = 1.0 / max(1, min(idle_fps, active_fps))
+        self.idle_delay = idle_delay
+        self.is_focused = is_focused or (lambda: True)
+        self.wake_event = threading.Event()
+        self.last_input_time = time.perf_counter()
+        self.current_fps = 0.0
+        self.cpu_time = 0.0
+        self.cpu_percent = 0.0
+        self.frame_count = 0
+        self.idle = False
+        self.frames_metric = REGISTRY.counter("render_frames", "GUI frames rendered.")
+        self.frame_metric = REGISTRY.histogram("render_frame_seconds", "Time spent rendering a GUI frame.")
+
+    def notify_input(self):
+        # UI interaction: render at full rate until idle_delay has passed.
+        self.last_input_time = time.perf_counter()
+        self.wake_event.set()
+
+    def notify_data(self):
+        # New data to display: render one frame now without leaving idle mode.
+        self.wake_event.set()
+
+    def frame_interval(self, now):
+        self.idle = now - self.last_input_time > self.idle_delay and not self.is_focused()
+        return self.idle_interval if self.idle else self.active_interval
+
+    def run(self, render_frame, is_running, on_first_frame=None):
+        cpu_start = time.thread_time()
+        window_start = time.perf_counter()
+        window_cpu = cpu_start
+        window_frames = 0
+        while is_running():
+            frame_start = time.perf_counter()
+            self.wake_event.clear()
+            render_frame()
+            self.frame_count += 1
+            self.frames_metric.inc()
+            self.frame_metric.observe(time.perf_counter() - frame_start)
+            if self.frame_count == 1 and on_first_frame:
+                on_first_frame()
+            window_frames += 1
+
+            now = time.perf_counter()
+            if now - window_start >= 1.0:
+                cpu_now = time.thread_time()
+                self.current_fps = window_frames / (now - window_start)
+                self.cpu_percent = (cpu_now - window_cpu) / (now - window_start) * 100
+                self.cpu_time = cpu_now - cpu_start
+                window_start, window_cpu, window_frames = now, cpu_now, 0
+
+            remaining = self.frame_interval(now) - (now - frame_start)
+            if remaining > 0:
+                self.wake_event.wait(remaining)
+
+    def stats(self):
+        return {
+            "fps": self.current_fps,
+            "cpu_time": self.cpu_time,
+            "cpu_percent": self.cpu_percent,
+            "idle": self.idle,
+            "frames": self.frame_count
+        }
@@ -0,0 +1,69 @@
+import time
+import numpy as np
+import cv2
+
+
+class ROIPreview:
+    # Composes the captured area, the detected bar and its scanline into one float32
+    # RGBA buffer that a DearPyGui raw texture reads directly; nothing is reallocated
+    # unless the captured area changes size. The buffer may be owned by the caller
+    # (e.g. an array.array('f') created before NumPy is loaded).
+    def __init__(self, width=220, height=48, buffer=None):
+        self.width = width
+        self.height = height
+        if buffer is None:
+            buffer = np.zeros(height * width * 4, dtype=np.float32)
+        self.buffer = np.frombuffer(buffer, dtype=np.float32).reshape(height, width, 4)
+        self.buffer[:, :, 3] = 1.0
+        self.scaled = None
+        self.rgba = None
+        self.updates = 0
+        self.total_time = 0.0
+
+    def ensure_scaled(self, height, width, channels):
+        if self.scaled is None or self.scaled.shape != (height, width, channels):
+            self.scaled = np.empty((height, width, channels), dtype=np.uint8)
+            self.rgba = np.empty((height, width, 4), dtype=np.uint8)
+            self.buffer[:, :, :3] = 0.0
+        return self.scaled
+
+    def update(self, bgr, rect=None):
+        # Takes BGR or BGRA; a contiguous BGRA capture avoids a copy inside cv2.resize.
+        start = time.perf_counter()
+        source_height, source_width, channels = bgr.shape
+        scale = min(self.width / source_width, self.height / source_height)
+        width = max(1, min(self.width, int(source_width * scale)))
+        height = max(1, min(self.height, int(source_height * scale)))
+        scaled = self.ensure_scaled(height, width, channels)
+        cv2.resize(bgr, (width, height), dst=scaled, interpolation=cv2.INTER_NEAREST)
+        # Swap to RGBA in uint8 and let OpenCV convert straight into the float buffer;
+        # a NumPy multiply of the reversed uint8 view would allocate cast buffers.
+        rgba = self.rgba
+        cv2.cvtColor(scaled, cv2.COLOR_BGRA2RGBA if channels == 4 else cv2.COLOR_BGR2RGBA, dst=rgba)
+        if channels == 4:
+            rgba[:, :, 3] = 255
+        cv2.multiply(rgba, 1 / 255, dst=self.buffer[:height, :width], dtype=cv2.CV_32F)
+
+        if rect is not None:
+            x, y, w, h = rect
+            left = min(width - 1, int(x * scale))
+            top = min(height - 1, int(y * scale))
+            right = min(width - 1, int((x + w) * scale))
+            bottom = min(height - 1, int((y + h) * scale))
+            outline = self.buffer[:, :, :3]
+            outline[top, left:right + 1] = (0.0, 1.0, 0.0)
+            outline[bottom, left:right + 1] = (0.0, 1.0, 0.0)
+            outline[top:bottom + 1, left] = (0.0, 1.0, 0.0)
+            outline[top:bottom + 1, right] = (0.0, 1.0, 0.0)
+            scanline = min(height - 1, int((y + h // 2) * scale))
+            outline[scanline, left + 1:right] = (1.0, 0.2, 0.2)
+
+        self.updates += 1
+        self.total_time += time.perf_counter() - start
+
+    def clear(self):
+        self.buffer[:, :, :3] = 0.0
+
+    @property
+    def average_ms(self):
+        return self.total_time / self.updates * 1000 if self.updates else 0.0
@@ -0,0 +1,104 @@
+import math
+import logging
+
+np = None  # loaded with the first Rotation so startup does not pay for NumPy
+
+DEFAULT_HOLD = 0.05
+
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+def legacy_slots(config_manager):
+    # The four key_to_press_N / frequency_N slots, used when no rotation is configured.
+    return tuple((config_manager.get(f'key_to_press_{i}'), config_manager.get(f'frequency_{i}')) for i in range(4))
+
+
+def legacy_rotation(slots):
+    return [{"key": key, "cooldown": frequency} for key, frequency in slots if key]
+
+
+def rotation_actions(config_manager):
+    return config_manager.get('rotation') or legacy_rotation(legacy_slots(config_manager))
+
+
+class Rotation:
+    # Any number of actions kept as parallel arrays, sorted by priority (lower first).
+    # ready() is a handful of vectorised comparisons over those arrays, so one decision
+    # costs the same few NumPy calls whether there are four skills or forty.
+    #
+    # An action is a dict: key, cooldown (s), priority (default 0), hold (s), min_hp /
+    # max_hp (HP % bounds), after (a key that must have been pressed more recently than
+    # this action, within after_window seconds) and enabled.
+    def __init__(self, actions=(), tick=0.05):
+        load_numpy()
+        self.tick = tick
+        entries = [entry for entry in actions if entry.get('key') and entry.get('enabled', True)]
+        entries.sort(key=lambda entry: entry.get('priority', 0))
+        count = len(entries)
+        self.keys = [str(entry['key']) for entry in entries]
+        self.cooldown = np.array([max(0.0, float(entry.get('cooldown', 1.0))) for entry in entries], dtype=np.float64)
+        self.priority = np.array([int(entry.get('priority', 0)) for entry in entries], dtype=np.int64)
+        self.hold = np.array([float(entry.get('hold', DEFAULT_HOLD)) for entry in entries], dtype=np.float64)
+        self.min_hp = np.array([self.bound(entry.get('min_hp'), -math.inf) for entry in entries], dtype=np.float64)
+        self.max_hp = np.array([self.bound(entry.get('max_hp'), math.inf) for entry in entries], dtype=np.float64)
+        self.has_hp_condition = np.isfinite(self.min_hp) | np.isfinite(self.max_hp)
+        index_of = {key: i for i, key in enumerate(self.keys)}
+        after = []
+        for entry in entries:
+            target = entry.get('after')
+            if target and str(target) not in index_of:
+                logging.warning(f"Rotation action {entry['key']} waits for unknown key {target}; ignoring the condition.")
+            after.append(index_of.get(str(target), -1) if target else -1)
+        self.after = np.array(after, dtype=np.int64)
+        self.has_after = self.after >= 0
+        self.after_target = np.maximum(self.after, 0)
+        self.after_window = np.array([float(entry.get('after_window', 1.0)) for entry in entries], dtype=np.float64)
+        self.conditional = bool(self.has_hp_condition.any() or self.has_after.any())
+        self.next_ready = np.zeros(count, dtype=np.float64)
+        self.last_pressed = np.full(count, -math.inf, dtype=np.float64)
+        self.holds = {}
+        for key, hold in zip(self.keys, self.hold):
+            self.holds[key] = max(self.holds.get(key, 0.0), float(hold))
+
+    @staticmethod
+    def bound(value, default):
+        return default if value is None else float(value)
+
+    @classmethod
+    def from_config(cls, config_manager):
+        return cls(rotation_actions(config_manager))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def ready(self, now, hp=None):
+        # Indices of the actions to press now, highest priority first.
+        if not self.keys:
+            return ()
+        mask = self.next_ready <= now
+        if self.conditional:
+            hp = math.nan if hp is None else hp
+            mask &= ~self.has_hp_condition | ((self.min_hp <= hp) & (hp <= self.max_hp))
+            target_pressed = self.last_pressed[self.after_target]
+            mask &= ~self.has_after | ((target_pressed > self.last_pressed) &
+                                       (now - target_pressed <= self.after_window))
+        return np.flatnonzero(mask)
+
+    def mark(self, index, now):
+        self.last_pressed[index] = now
+        self.next_ready[index] = now + self.cooldown[index]
+
+    def next_wake(self, now):
+        # Conditions can change at any moment, so conditional rotations re-check every tick.
+        if not self.keys:
+            return now + 0.1
+        wake = float(self.next_ready.min())
+        if self.conditional:
+            wake = min(wake, now + self.tick)
+        # A zero cooldown would otherwise wake at `now` and spin the thread.
+        return wake if wake > now else now + self.tick
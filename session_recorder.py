@@ -0,0 +1,98 @@
+import os
+import mmap
+import struct
+import logging
+import threading
+import time
+from datetime import datetime
+
+MAGIC = b'ZXSR'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')
+RECORD = struct.Struct('<BBHIdffhhhhf12s')
+
+RECORD_HP = 0
+RECORD_ACTION = 1
+
+ACTION_TYPES = {'key': 1, 'mouse': 2}
+
+
+class SessionRecorder:
+    def __init__(self, path=None, directory='sessions', chunk_records=65536):
+        if path is None:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zxr")
+        self.path = path
+        self.chunk_size = chunk_records * RECORD.size
+        self.lock = threading.Lock()
+        self.count = 0
+        self.closed = False
+        self.file = open(path, 'w+b')
+        self.capacity = 0
+        self.mm = None
+        self.grow()
+        logging.info(f"Recording session to {path}")
+
+    def grow(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.capacity += self.chunk_size // RECORD.size
+        self.file.truncate(HEADER.size + self.capacity * RECORD.size)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        HEADER.pack_into(self.mm, 0, MAGIC, VERSION, RECORD.size, self.count)
+
+    def append(self, kind, action_type, timestamp, hp, confidence, rect, action, delay):
+        x, y, w, h = rect if rect is not None else (-1, -1, -1, -1)
+        with self.lock:
+            if self.closed:
+                return
+            if self.count == self.capacity:
+                self.grow()
+            RECORD.pack_into(self.mm, HEADER.size + self.count * RECORD.size,
+                             kind, action_type, 0, self.count, timestamp, hp, confidence,
+                             x, y, w, h, delay, action)
+            self.count += 1
+            # The header count is what readers trust, so it is bumped last.
+            struct.pack_into('<Q', self.mm, 8, self.count)
+
+    def record_hp(self, hp_percentage, confidence, rect, timestamp=None):
+        self.append(RECORD_HP, 0, time.time() if timestamp is None else timestamp,
+                    -1.0 if hp_percentage is None else hp_percentage, confidence, rect, b'', 0.0)
+
+    def record_action(self, action_type, action, queue_delay, timestamp=None):
+        self.append(RECORD_ACTION, ACTION_TYPES.get(action_type, 0), time.time() if timestamp is None else timestamp,
+                    0.0, 0.0, None, str(action).encode('utf-8', 'replace')[:12], queue_delay)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.mm.flush()
+            self.mm.close()
+            self.file.truncate(HEADER.size + self.count * RECORD.size)
+            self.file.close()
+        logging.info(f"Session recording closed: {self.count} records in {self.path}")
+
+
+def record_dtype():
+    import numpy as np
+    return np.dtype([
+        ('kind', 'u1'), ('action_type', 'u1'), ('reserved', '<u2'), ('seq', '<u4'),
+        ('timestamp', '<f8'), ('hp', '<f4'), ('confidence', '<f4'),
+        ('x', '<i2'), ('y', '<i2'), ('w', '<i2'), ('h', '<i2'),
+        ('queue_delay', '<f4'), ('action', 'S12')
+    ])
+
+
+def load_session(path):
+    import numpy as np
+    with open(path, 'rb') as f:
+        magic, version, record_size, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a ZXOneButton session file: {path}")
+    dtype = record_dtype()
+    if record_size != dtype.itemsize:
+        raise ValueError(f"Unexpected record size {record_size} in {path}")
+    records = np.fromfile(path, dtype=dtype, count=count, offset=HEADER.size)
+    return records[records['kind'] == RECORD_HP], records[records['kind'] == RECORD_ACTION]
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+from clock import VirtualClock
+from capture import SyntheticCapture
+from display_geometry import DisplayCalibration
+from hp_monitor import HPMonitor
+from input_backend import RecordingBackend
+from key_presser import KeyPresser
+from rotation import Rotation
+
+SIMULATION_DEFAULTS = {
+    "key_to_press_0": "1",
+    "frequency_0": 0.5,
+    "key_to_press_1": "2",
+    "frequency_1": 1.0,
+    "left_click_var": True,
+    "left_click_freq": 0.1,
+    "hp_key": "5",
+    "hp_level": 60,
+    "hp_frequency": 1.0,
+    "monitor_hp": True,
+    "save_hp_bar_images": False,
+    "vision_process_mode": False,
+    "auto_tune": False,
+    "gauges": [],
+}
+
+
+class SimulationConfig:
+    # In-memory stand-in for ConfigManager so simulations never touch config.json.
+    def __init__(self, overrides=None):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'default_config.json')
+        with open(path, 'r') as f:
+            self.config = json.load(f)
+        self.config.update(SIMULATION_DEFAULTS)
+        self.config.update(overrides or {})
+
+    def get(self, key, default=None):
+        return self.config.get(key, default)
+
+    def set(self, key, value):
+        self.config[key] = value
+
+    def update_config(self, new_config):
+        self.config.update(new_config)
+
+
+class SimulatedCharacter:
+    # HP drains steadily and each HP key press heals after a short delay, so the
+    # potion controller sees a real rise to confirm.
+    def __init__(self, clock, backend, hp_key, drain_per_second=4.0, heal=35.0, heal_delay=0.2):
+        self.clock = clock
+        self.backend = backend
+        self.hp_key = hp_key
+        self.drain_per_second = drain_per_second
+        self.heal = heal
+        self.heal_delay = heal_delay
+        self.current = 100.0
+        self.lowest = 100.0
+        self.last_update = clock.now()
+        self.seen_events = 0
+        self.pending_heals = []
+
+    def __call__(self):
+        now = self.clock.now()
+        with self.backend.lock:
+            events = self.backend.events[self.seen_events:]
+            self.seen_events = len(self.backend.events)
+        for timestamp, kind, value in events:
+            if kind == 'key_down' and value == self.hp_key:
+                self.pending_heals.append(timestamp + self.heal_delay)
+
+        self.current -= self.drain_per_second * (now - self.last_update)
+        self.last_update = now
+        due = [t for t in self.pending_heals if t <= now]
+        if due:
+            self.pending_heals = [t for t in self.pending_heals if t > now]
+            self.current += self.heal * len(due)
+        self.current = min(100.0, max(2.0, self.current))
+        self.lowest = min(self.lowest, self.current)
+        return self.current
+
+
+    def forget_seen_events(self):
+        # Long runs drop the events already applied so the recording stays bounded.
+        with self.backend.lock:
+            forgotten = self.seen_events
+            del self.backend.events[:forgotten]
+            self.seen_events = 0
+        return forgotten
+
+
+def achieved_rates(counts, duration, config):
+    # Conditional rotation actions can fire less often than their cooldown allows.
+    rates = {}
+    rotation = Rotation.from_config(config)
+    for key, cooldown in zip(rotation.keys, rotation.cooldown):
+        rates[f"key_{key}"] = {
+            "configured_per_s": 1 / cooldown if cooldown else None,
+            "achieved_per_s": counts.get(('key_down', key), 0) / duration,
+        }
+    for button in ('left', 'right'):
+        if config.get(f'{button}_click_var'):
+            rates[f"{button}_click"] = {
+                "configured_per_s": 1 / config.get(f'{button}_click_freq'),
+                "achieved_per_s": counts.get(('click', button), 0) / duration,
+            }
+    return rates
+
+
+def build_simulation(config, clock):
+    # KeyPresser (and HPMonitor when enabled) wired to a recording backend and a
+    # synthetic HP bar, all on the given clock.
+    backend = RecordingBackend(clock=clock.now)
+    key_presser = KeyPresser(config.config, config, input_backend=backend, clock=clock)
+    character = SimulatedCharacter(clock, backend, config.get('hp_key'))
+
+    hp_monitor = None
+    if config.get('monitor_hp'):
+        hp_monitor = HPMonitor(config, key_presser, 1.0, clock=clock)
+        hp_monitor.calibration = DisplayCalibration(config, 1.0, size=(1920, 1080))
+        capture = SyntheticCapture(hp_source=character)
+        hp_monitor.capture_backends = [capture, capture]
+        hp_monitor.screenshot_area = {"left": 0, "top": 0, "width": 200, "height": 40}
+    return backend, key_presser, hp_monitor, character
+
+
+def run_simulation(duration=3600.0, overrides=None):
+    config = SimulationConfig(overrides)
+    clock = VirtualClock()
+    clock.register()  # this thread drives the run and must block through the clock too
+    backend, key_presser, hp_monitor, character = build_simulation(config, clock)
+
+    wall_start = time.perf_counter()
+    key_presser.start_pressing()
+    if hp_monitor:
+        hp_monitor.start_monitoring()
+    clock.sleep(duration)
+    if hp_monitor:
+        hp_monitor.stop_monitoring()
+    key_presser.stop_pressing()
+    wall_time = time.perf_counter() - wall_start
+    clock.unregister()
+
+    report = {
+        "simulated_s": duration,
+        "wall_s": wall_time,
+        "speedup": duration / wall_time,
+        "rates": achieved_rates(backend.counts(), duration, config),
+        "worst_queue_delay_ms": key_presser.max_queue_delay * 1000,
+    }
+    if hp_monitor and hp_monitor.potion:
+        potion = hp_monitor.potion
+        report["potions"] = {
+            "presses": potion.presses,
+            "confirmed": potion.confirmed,
+            "no_effect": potion.failed,
+            "lowest_hp": character.lowest,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run KeyPresser and HPMonitor under simulated time")
+    parser.add_argument("--duration", type=float, default=3600.0, help="Simulated seconds")
+    parser.add_argument("--config", help="JSON file with config overrides")
+    parser.add_argument("--output", help="Write the report as JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    overrides = None
+    if args.config:
+        with open(args.config, 'r') as f:
+            overrides = json.load(f)
+    text = json.dumps(run_simulation(args.duration, overrides), indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
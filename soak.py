@@ -0,0 +1,238 @@
+import gc
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+from clock import VirtualClock
+from image_writer import HPImageWriter
+from simulation import SimulationConfig, build_simulation
+
+SOAK_DEFAULTS = {
+    "save_hp_bar_images": True,
+    "right_click_var": True,
+    "right_click_freq": 0.25,
+    "hold_shift_key": True,
+}
+
+# The HP image writer may fill its quota at any point; only going past it is a leak.
+IMAGE_QUOTA = 20
+
+# Ceilings no single sample may exceed, whatever the trend.
+SAMPLE_LIMITS = {
+    "image_files": IMAGE_QUOTA,
+}
+
+# Allowed rise of the late-run average over the early-run average, per metric:
+# (relative tolerance, absolute slack).
+TREND_LIMITS = {
+    "traced_bytes": (0.0, 64 * 1024),
+    "threads": (0.0, 0),
+    "key_queue": (0.0, 2),
+    "hp_key_queue": (0.0, 2),
+    "image_queue": (0.0, 8),
+    "image_files": (0.0, IMAGE_QUOTA),
+    "dpg_items": (0.0, 0),
+    "log_items": (0.0, 0),
+}
+
+
+def trend(values, tolerance, slack, warmup=0.25):
+    # Compares the mean of the last quarter of the run with the first quarter after warm-up.
+    values = values[int(len(values) * warmup):]
+    if len(values) < 4:
+        return None
+    quarter = len(values) // 4
+    early = sum(values[:quarter]) / quarter
+    late = sum(values[-quarter:]) / quarter
+    return {
+        "first": values[0],
+        "last": values[-1],
+        "early_mean": early,
+        "late_mean": late,
+        "growing": late > early * (1 + tolerance) + slack,
+    }
+
+
+class SoakGUI:
+    # The parts of the GUI that update continuously, built in a hidden DearPyGui context.
+    def __init__(self, config, hp_monitor, key_presser):
+        import dearpygui.dearpygui as dpg
+        from gui import GUI
+        self.dpg = dpg
+        dpg.create_context()
+        self.gui = GUI(config, hp_monitor, key_presser, scaling_factor=1.0)
+        self.gui.load_font()
+        with dpg.window(tag="main_window"):
+            self.gui.create_hp_settings()
+            self.gui.create_status_section()
+            self.gui.create_log_window()
+        self.messages = 0
+
+    def tick(self):
+        # Mirrors GUI.update_status_labels.
+        self.gui.update_diablo_window_status()
+        self.gui.update_hp()
+        self.gui.update_hp_graph()
+        self.gui.update_preview()
+
+    def log(self):
+        self.messages += 1
+        self.gui.log_message(f"Soak message {self.messages}")
+
+    def item_count(self):
+        return len(self.dpg.get_all_items())
+
+    def close(self):
+        self.dpg.destroy_context()
+
+
+def create_soak_gui(config, hp_monitor, key_presser):
+    try:
+        return SoakGUI(config, hp_monitor, key_presser)
+    except ImportError as e:
+        logging.warning(f"DearPyGui unavailable ({e}); soaking without the GUI.")
+        return None
+
+
+def run_soak(duration=3600.0, sample_interval=60.0, restart_interval=600.0, tick=0.1, overrides=None):
+    # The written HP images are only counted, so they go away with the run.
+    with tempfile.TemporaryDirectory(prefix="soak_hp_images_", ignore_cleanup_errors=True) as image_dir:
+        return soak(image_dir, duration, sample_interval, restart_interval, tick, overrides)
+
+
+def soak(image_dir, duration, sample_interval, restart_interval, tick, overrides):
+    config = SimulationConfig({**SOAK_DEFAULTS, **(overrides or {})})
+    clock = VirtualClock()
+    clock.register()  # the driver thread blocks through the clock like every participant
+    backend, key_presser, hp_monitor, character = build_simulation(config, clock)
+    if hp_monitor:
+        # A small quota and no rate limit so the writer reaches its steady state early.
+        hp_monitor.image_writer = HPImageWriter(directory=image_dir, max_files=IMAGE_QUOTA, min_interval=0.0)
+    gui = create_soak_gui(config, hp_monitor, key_presser)
+
+    tracemalloc.start()
+    samples = {name: [] for name in TREND_LIMITS}
+    snapshots = []
+    baseline_sample = max(1, int(duration / sample_interval * 0.25))
+    recorded_events = 0
+    wall_start = time.perf_counter()
+    key_presser.start_pressing()
+    if hp_monitor:
+        hp_monitor.start_monitoring()
+
+    next_sample = clock.now() + sample_interval
+    next_restart = clock.now() + restart_interval
+    end = clock.now() + duration
+    while clock.now() < end:
+        clock.sleep(tick if gui else min(next_sample, next_restart, end) - clock.now())
+        if gui:
+            gui.tick()
+        if clock.now() >= next_restart:
+            # Stop/start and pause/resume cycles are where threads and queued actions leak.
+            next_restart += restart_interval
+            key_presser.pause()
+            key_presser.resume()
+            key_presser.stop_pressing()
+            key_presser.start_pressing()
+            if gui:
+                gui.log()
+        if clock.now() >= next_sample:
+            next_sample += sample_interval
+            # The recording backend keeps every event; drop the ones already consumed so
+            # only the code under test can show growth.
+            if hp_monitor:
+                recorded_events += character.forget_seen_events()
+            else:
+                with backend.lock:
+                    recorded_events += len(backend.events)
+                    backend.events.clear()
+            gc.collect()  # uncollected cycles are not retained memory
+            samples["traced_bytes"].append(tracemalloc.get_traced_memory()[0])
+            samples["threads"].append(threading.active_count())
+            samples["key_queue"].append(key_presser.key_press_queue.qsize())
+            samples["hp_key_queue"].append(key_presser.hp_key_press_queue.qsize())
+            if hp_monitor:
+                samples["image_queue"].append(hp_monitor.image_writer.queue.qsize())
+                samples["image_files"].append(len(os.listdir(image_dir)) if os.path.isdir(image_dir) else 0)
+            if gui:
+                samples["dpg_items"].append(gui.item_count())
+                samples["log_items"].append(len(gui.gui.log_items))
+            if len(samples["threads"]) == baseline_sample:
+                snapshots.append(tracemalloc.take_snapshot())
+
+    if hp_monitor:
+        hp_monitor.stop_monitoring()
+    key_presser.stop_pressing()
+    recorded_events += len(backend.events)
+    wall_time = time.perf_counter() - wall_start
+    clock.unregister()
+    snapshots.append(tracemalloc.take_snapshot())
+    tracemalloc.stop()
+    if gui:
+        gui.close()
+
+    trends = {}
+    for name, values in samples.items():
+        result = trend(values, *TREND_LIMITS[name])
+        if result:
+            trends[name] = result
+    over_limit = sorted(name for name, limit in SAMPLE_LIMITS.items() if samples[name] and max(samples[name]) > limit)
+    top_growth = []
+    if len(snapshots) >= 2:
+        for stat in snapshots[-1].compare_to(snapshots[0], 'lineno')[:5]:
+            top_growth.append({"where": str(stat.traceback), "size_diff": stat.size_diff, "count_diff": stat.count_diff})
+    return {
+        "simulated_s": duration,
+        "wall_s": wall_time,
+        "samples": len(samples["threads"]),
+        "gui": gui is not None,
+        "coalesced_actions": key_presser.coalesced_actions,
+        "events": recorded_events,
+        "trends": trends,
+        "top_allocation_growth": top_growth,
+        "growing": sorted(name for name, result in trends.items() if result["growing"]),
+        "over_limit": over_limit,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak KeyPresser, HPMonitor and the GUI updates under simulated time")
+    parser.add_argument("--duration", type=float, default=3600.0, help="Simulated seconds")
+    parser.add_argument("--sample-interval", type=float, default=60.0, help="Simulated seconds between samples")
+    parser.add_argument("--restart-interval", type=float, default=600.0,
+                        help="Simulated seconds between key presser stop/start cycles")
+    parser.add_argument("--config", help="JSON file with config overrides")
+    parser.add_argument("--output", help="Write the report as JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    overrides = None
+    if args.config:
+        with open(args.config, 'r') as f:
+            overrides = json.load(f)
+    report = run_soak(args.duration, args.sample_interval, args.restart_interval, overrides=overrides)
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    failed = False
+    if report["growing"]:
+        logging.error(f"Upward trend in: {', '.join(report['growing'])}")
+        failed = True
+    if report["over_limit"]:
+        logging.error(f"Over the limit: {', '.join(report['over_limit'])}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
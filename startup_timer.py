@@ -0,0 +1,32 @@
+import time
+import logging
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def report(self, milestone="first frame"):
+        if self.reported:
+            return
+        self.reported = True
+        total = self.elapsed()
+        logging.info(f"Startup: {milestone} after {total * 1000:.0f} ms")
+        for name, duration in self.phases:
+            logging.info(f"  {name:<28} {duration * 1000:8.1f} ms")
+        accounted = sum(duration for _, duration in self.phases)
+        logging.info(f"  {'other':<28} {(total - accounted) * 1000:8.1f} ms")
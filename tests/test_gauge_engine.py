@@ -0,0 +1,37 @@
+from gauge_engine import Gauge, GaugeEngine
+
+
+class FakePresser:
+    def __init__(self, accept):
+        self.accept = accept
+        self.keys = []
+
+    def press_priority_key(self, key):
+        self.keys.append(key)
+        return self.accept
+
+
+def low_gauge():
+    gauge = Gauge("mana", {"left": 0, "top": 0, "width": 100, "height": 10}, "blue", threshold=30, key="q", cooldown=5.0)
+    gauge.last_value = 10.0
+    return gauge
+
+
+def test_accepted_press_starts_cooldown():
+    gauge = low_gauge()
+    presser = FakePresser(accept=True)
+    engine = GaugeEngine([gauge], presser)
+    engine.trigger(100.0)
+    engine.trigger(101.0)
+    assert presser.keys == ["q"]
+    assert gauge.last_triggered == 100.0
+
+
+def test_refused_press_is_retried():
+    gauge = low_gauge()
+    presser = FakePresser(accept=False)
+    engine = GaugeEngine([gauge], presser)
+    engine.trigger(100.0)
+    engine.trigger(101.0)
+    assert presser.keys == ["q", "q"]
+    assert gauge.last_triggered == 0.0
@@ -0,0 +1,65 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from hp_detector import HPDetector, HPEstimator
+
+# Small Python objects (tuples, floats) are expected; any per-frame image buffer is far larger.
+ALLOCATION_BUDGET = 1024
+
+
+def peak_allocation(fn, iterations=200):
+    # Largest number of bytes allocated at once during a single steady-state call. A net
+    # before/after comparison would miss buffers that are allocated and freed every call.
+    fn()
+    tracemalloc.start()
+    worst = 0
+    try:
+        for _ in range(iterations):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            fn()
+            worst = max(worst, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return worst
+
+
+@pytest.fixture
+def frame():
+    frame = np.full((120, 300, 4), 90, dtype=np.uint8)
+    frame[50:58, 100:150] = (255, 80, 40, 255)
+    frame[50:58, 150:170] = (0, 0, 0, 255)
+    return frame
+
+
+def test_detects_regular_bar(frame):
+    detector = HPDetector()
+    rect = detector.detect_regular(frame)
+    assert rect is not None
+    percentage, confidence = detector.regular_percentage(frame, rect)
+    assert confidence == 1.0
+    assert 65 < percentage < 80
+
+
+def sample_steps(detector, frame):
+    rect = detector.detect_regular(frame)
+    full = HPEstimator(skip_unchanged=False, detector=detector)
+    skipping = HPEstimator(skip_unchanged=True, detector=detector)
+    return {
+        "scanline": lambda: detector.regular_percentage(frame, rect),
+        "detect": lambda: detector.detect_regular(frame),
+        "estimate": lambda: full.estimate(frame),
+        "estimate_skip_unchanged": lambda: skipping.estimate(frame),
+    }
+
+
+@pytest.mark.parametrize("step", ["scanline", "detect", "estimate", "estimate_skip_unchanged"])
+def test_steady_state_sample_allocates_no_buffers(frame, step):
+    call = sample_steps(HPDetector(), frame)[step]
+    assert peak_allocation(call) <= ALLOCATION_BUDGET
+
+
+def test_budget_catches_a_per_frame_copy(frame):
+    assert peak_allocation(lambda: frame.copy()) > ALLOCATION_BUDGET
@@ -0,0 +1,121 @@
+import pytest
+
+from clock import VirtualClock
+from input_backend import RecordingBackend
+from key_presser import KeyPresser
+from simulation import SimulationConfig
+
+NO_EXTRAS = {
+    "left_click_var": False,
+    "right_click_var": False,
+    "hold_shift_key": False,
+    "key_to_press_0": "",
+    "key_to_press_1": "",
+    "key_to_press_2": "",
+    "key_to_press_3": "",
+}
+
+
+class PickyBackend(RecordingBackend):
+    # Cannot send "bad" and fails while injecting "boom".
+    def supports(self, key):
+        return key != "bad"
+
+    def key_down(self, key):
+        if key == "boom":
+            raise ValueError("cannot inject boom")
+        super().key_down(key)
+
+
+def create_presser(overrides=None, backend_class=RecordingBackend, batched=True):
+    config = SimulationConfig({**NO_EXTRAS, **(overrides or {})})
+    clock = VirtualClock()
+    backend = backend_class(clock=clock.now)
+    backend.batched = batched
+    return KeyPresser(config.config, config, input_backend=backend, clock=clock), backend, clock
+
+
+def run(presser, clock, duration, before_start=()):
+    clock.register()
+    try:
+        for key in before_start:
+            presser.press_priority_key(key)
+        presser.start_pressing()
+        clock.sleep(duration)
+        presser.stop_pressing()
+    finally:
+        clock.unregister()
+
+
+def key_events(backend, keys):
+    return [(kind, key) for _, kind, key in backend.events if key in keys]
+
+
+def presses(backend, key):
+    return backend.counts().get(("key_down", key), 0)
+
+
+def test_repeated_key_is_not_merged_into_one_press():
+    presser, backend, clock = create_presser()
+    run(presser, clock, 1.0, before_start=["5", "5"])
+    assert key_events(backend, {"5"}) == [("key_down", "5"), ("key_up", "5"), ("key_down", "5"), ("key_up", "5")]
+
+
+def test_distinct_keys_share_one_hold():
+    presser, backend, clock = create_presser()
+    run(presser, clock, 1.0, before_start=["5", "6"])
+    events = [(t, kind, key) for t, kind, key in backend.events if key in {"5", "6"}]
+    assert [(kind, key) for _, kind, key in events] == [
+        ("key_down", "5"), ("key_down", "6"), ("key_up", "5"), ("key_up", "6")]
+    assert events[0][0] == events[1][0]
+
+
+def test_sequential_backend_presses_one_key_at_a_time():
+    presser, backend, clock = create_presser(batched=False)
+    run(presser, clock, 1.0, before_start=["5", "6"])
+    assert key_events(backend, {"5", "6"}) == [
+        ("key_down", "5"), ("key_up", "5"), ("key_down", "6"), ("key_up", "6")]
+
+
+def test_failed_batch_releases_pressed_keys():
+    presser, backend, clock = create_presser(backend_class=PickyBackend)
+    with pytest.raises(ValueError):
+        presser.process_actions([("key", "2", 0.0), ("key", "boom", 0.0)])
+    assert key_events(backend, {"2", "boom"}) == [("key_down", "2"), ("key_up", "2")]
+
+
+def test_unsupported_keys_are_left_out():
+    presser, backend, clock = create_presser(
+        {"key_to_press_0": "1", "frequency_0": 0.5, "key_to_press_1": "bad", "frequency_1": 0.5},
+        backend_class=PickyBackend)
+    run(presser, clock, 5.0)
+    assert presser.rotation.keys == ["1"]
+    assert not presser.press_priority_key("bad")
+    assert key_events(backend, {"bad"}) == []
+
+
+def test_rotation_keeps_the_configured_rate():
+    presser, backend, clock = create_presser({"key_to_press_0": "1", "frequency_0": 0.5})
+    run(presser, clock, 60.0)
+    assert 119 <= presses(backend, "1") <= 121
+
+
+def test_pause_keeps_threads_and_stops_presses():
+    presser, backend, clock = create_presser({"key_to_press_0": "1", "frequency_0": 0.5})
+    clock.register()
+    try:
+        presser.start_pressing()
+        clock.sleep(5.0)
+        threads = list(presser.threads)
+        presser.pause()
+        paused_at = presses(backend, "1")
+        clock.sleep(5.0)
+        assert presses(backend, "1") == paused_at
+        presser.resume()
+        clock.sleep(5.0)
+        assert presser.threads == threads
+        assert all(thread.is_alive() for thread in threads)
+        assert presses(backend, "1") > paused_at
+    finally:
+        presser.stop_pressing()
+        clock.unregister()
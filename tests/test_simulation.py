@@ -0,0 +1,48 @@
+import threading
+import time
+
+from clock import VirtualClock
+from simulation import run_simulation
+
+
+def test_virtual_clock_orders_sleepers_by_deadline():
+    clock = VirtualClock()
+    woke = []
+
+    def sleeper(seconds):
+        clock.sleep(seconds)
+        woke.append((seconds, clock.now()))
+
+    clock.register()
+    threads = [clock.thread(sleeper, seconds) for seconds in (3.0, 1.0, 2.0)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    clock.sleep(3600.0)
+    clock.unregister()
+    for thread in threads:
+        thread.join(timeout=1.0)
+    assert woke == [(1.0, 1.0), (2.0, 2.0), (3.0, 3.0)]
+    assert clock.now() == 3600.0
+    assert time.perf_counter() - start < 1.0
+
+
+def test_virtual_clock_wait_times_out_in_simulated_time():
+    clock = VirtualClock()
+    clock.register()
+    try:
+        assert not clock.wait(threading.Event(), 30.0)
+        assert clock.now() == 30.0
+    finally:
+        clock.unregister()
+
+
+def test_simulated_hour_keeps_configured_rates():
+    report = run_simulation(3600.0)
+    for name, rate in report["rates"].items():
+        assert abs(rate["achieved_per_s"] - rate["configured_per_s"]) <= 0.05 * rate["configured_per_s"], name
+    assert report["worst_queue_delay_ms"] <= 100
+    potions = report["potions"]
+    assert potions["presses"] > 0
+    assert potions["confirmed"] == potions["presses"]
+    assert potions["lowest_hp"] > 0
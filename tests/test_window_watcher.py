@@ -0,0 +1,61 @@
+import time
+
+from window_watcher import PollingWindowWatcher, WindowProvider, create_window_watcher
+
+
+class FakeWindowProvider(WindowProvider):
+    def __init__(self, titles, foreground=0):
+        self.titles = titles
+        self.foreground = foreground
+        self.title_reads = 0
+
+    def foreground_window(self):
+        return self.foreground
+
+    def window_title(self, hwnd):
+        self.title_reads += 1
+        return self.titles[hwnd]
+
+
+def test_focus_changes_notify_listeners_once():
+    provider = FakeWindowProvider({1: "Diablo IV", 2: "Browser"})
+    watcher = PollingWindowWatcher("Diablo IV", provider)
+    changes = []
+    watcher.subscribe(changes.append)
+    for hwnd in (1, 1, 2, 2, 1, 0):
+        provider.foreground = hwnd
+        watcher.refresh()
+    assert changes == [True, False, True, False]
+    assert not watcher.is_active
+
+
+def test_titles_are_read_once_per_window():
+    provider = FakeWindowProvider({1: "Diablo IV", 2: "Browser"})
+    watcher = PollingWindowWatcher("Diablo IV", provider)
+    for hwnd in (1, 2, 1, 2, 1):
+        provider.foreground = hwnd
+        watcher.refresh()
+    assert provider.title_reads == 2
+
+
+def test_unreadable_title_counts_as_inactive():
+    provider = FakeWindowProvider({})
+    watcher = PollingWindowWatcher("Diablo IV", provider)
+    provider.foreground = 7
+    watcher.refresh()
+    assert not watcher.is_active
+
+
+def test_polling_watcher_follows_focus():
+    provider = FakeWindowProvider({1: "Diablo IV", 2: "Browser"}, foreground=1)
+    changes = []
+    watcher = create_window_watcher("Diablo IV", changes.append, provider=provider, poll_interval=0.01)
+    try:
+        assert watcher.is_active
+        provider.foreground = 2
+        deadline = time.monotonic() + 2.0
+        while watcher.is_active and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert changes == [True, False]
+    finally:
+        watcher.stop()
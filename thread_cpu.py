@@ -0,0 +1,59 @@
+import os
+import ctypes
+import threading
+
+THREAD_QUERY_LIMITED_INFORMATION = 0x0800
+
+
+class FILETIME(ctypes.Structure):
+    _fields_ = [("low", ctypes.c_ulong), ("high", ctypes.c_ulong)]
+
+    @property
+    def seconds(self):
+        return ((self.high << 32) | self.low) / 1e7
+
+
+def windows_thread_time(native_id):
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenThread(THREAD_QUERY_LIMITED_INFORMATION, False, native_id)
+    if not handle:
+        return None
+    try:
+        creation, exit_time, kernel, user = FILETIME(), FILETIME(), FILETIME(), FILETIME()
+        if not kernel32.GetThreadTimes(handle, ctypes.byref(creation), ctypes.byref(exit_time),
+                                       ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        return kernel.seconds + user.seconds
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def proc_thread_time(native_id):
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", 'r') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Fields after the parenthesised name start at field 3 (state); utime and stime are 14 and 15.
+    fields = stat[stat.rindex(')') + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def thread_cpu_time(thread):
+    # CPU seconds (user + kernel) used so far by a live thread, or None if unavailable.
+    native_id = getattr(thread, 'native_id', None)
+    if native_id is None:
+        return None
+    if os.name == 'nt':
+        return windows_thread_time(native_id)
+    return proc_thread_time(native_id)
+
+
+def thread_cpu_times(threads=None):
+    # {thread name: CPU seconds} for the given threads, or every live Python thread.
+    times = {}
+    for thread in threading.enumerate() if threads is None else threads:
+        cpu = thread_cpu_time(thread)
+        if cpu is not None:
+            times[thread.name] = times.get(thread.name, 0.0) + cpu
+    return times
@@ -0,0 +1,246 @@
+import time
+import logging
+import multiprocessing
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from capture import Frame, create_capture
+
+VisionSample = namedtuple('VisionSample', 'timestamp hp_percentage confidence rect slot sequence')
+
+HEADER_FIELDS = 4  # sequence, height, width, timestamp_ns
+
+
+class FrameRing:
+    # Fixed slots of BGR pixels in one shared memory block. A slot's sequence is
+    # set to -1 while it is being written, so readers can detect torn frames.
+    def __init__(self, shm, slots, slot_bytes):
+        self.shm = shm
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.header = np.ndarray((slots, HEADER_FIELDS), dtype=np.int64, buffer=shm.buf)
+        self.data = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=shm.buf, offset=self.header.nbytes)
+        self.next_slot = 0
+        self.sequence = 0
+
+    @classmethod
+    def create(cls, slots, slot_bytes):
+        shm = shared_memory.SharedMemory(create=True, size=slots * HEADER_FIELDS * 8 + slots * slot_bytes)
+        ring = cls(shm, slots, slot_bytes)
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        return cls(shared_memory.SharedMemory(name=name), slots, slot_bytes)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, bgr):
+        height, width = bgr.shape[:2]
+        size = height * width * 3
+        if size > self.slot_bytes:
+            return -1, 0
+        slot = self.next_slot
+        self.next_slot = (slot + 1) % self.slots
+        self.sequence += 1
+        header = self.header[slot]
+        header[0] = -1
+        np.copyto(self.data[slot, :size].reshape(height, width, 3), bgr)
+        header[1] = height
+        header[2] = width
+        header[3] = time.time_ns()
+        header[0] = self.sequence
+        return slot, self.sequence
+
+    def read(self, slot, sequence):
+        if slot < 0 or self.header[slot, 0] != sequence:
+            return None
+        height, width = int(self.header[slot, 1]), int(self.header[slot, 2])
+        pixels = self.data[slot, :height * width * 3].reshape(height, width, 3).copy()
+        if self.header[slot, 0] != sequence:
+            return None
+        return Frame(pixels, 'BGR')
+
+    def close(self):
+        # Views must be released before the mapping can be closed.
+        self.header = None
+        self.data = None
+        self.shm.close()
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedFrameRef:
+    # Lazily copies a frame out of the ring; most samples never need their pixels.
+    def __init__(self, ring, slot, sequence):
+        self.ring = ring
+        self.slot = slot
+        self.sequence = sequence
+
+    @property
+    def bgr(self):
+        frame = self.ring.read(self.slot, self.sequence)
+        return frame.bgr if frame is not None else None
+
+
+def run_vision_worker(area, use_party_hp_bar, skip_unchanged, capture_name, interval,
+                      ring_name, slots, slot_bytes, results, commands, stop_event, log_level=logging.INFO,
+                      colour_ranges=None, geometry=None):
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - [vision] %(message)s')
+    ring = None
+    capture = None
+    try:
+        from hp_detector import HPDetector, HPEstimator
+        ring = FrameRing.attach(ring_name, slots, slot_bytes)
+        estimator = HPEstimator(use_party_hp_bar, skip_unchanged, HPDetector(colour_ranges, geometry))
+        capture = create_capture(capture_name)
+    except Exception as e:
+        results.send(('error', str(e)))
+        if ring:
+            ring.close()
+        return
+
+    results.send(('ready',))
+    next_sample = time.perf_counter()
+    try:
+        while not stop_event.is_set():
+            while commands.poll():
+                name, value = commands.recv()
+                if name == 'use_party_hp_bar':
+                    estimator.set_use_party_hp_bar(value)
+                elif name == 'area':
+                    area = value
+                    estimator.reset()
+
+            try:
+                frame = capture.grab(area)
+                hp_percentage = estimator.estimate(frame)
+                slot, sequence = ring.write(frame.bgr)
+                results.send(('sample', VisionSample(time.time(), hp_percentage, estimator.last_confidence,
+                                                     estimator.last_hp_bar, slot, sequence)))
+            except (BrokenPipeError, EOFError):
+                break
+            except Exception as e:
+                logging.error(f"Vision worker sample failed: {e}")
+                results.send(('sample', VisionSample(time.time(), None, 0.0, None, -1, 0)))
+
+            next_sample += interval
+            remaining = next_sample - time.perf_counter()
+            if remaining > 0:
+                stop_event.wait(remaining)
+            else:
+                next_sample = time.perf_counter()
+    except (BrokenPipeError, EOFError):
+        pass
+    finally:
+        capture.close()
+        ring.close()
+
+
+class VisionProcess:
+    def __init__(self, area, use_party_hp_bar=False, skip_unchanged=True, capture='mss', interval=0.1, slots=4,
+                 colour_ranges=None, geometry=None):
+        self.area = area
+        self.colour_ranges = colour_ranges
+        self.geometry = geometry
+        self.use_party_hp_bar = use_party_hp_bar
+        self.skip_unchanged = skip_unchanged
+        self.capture = capture
+        self.interval = interval
+        self.slots = slots
+        self.process = None
+        self.ring = None
+        self.results = None
+        self.commands = None
+        self.stop_event = None
+
+    def start(self, timeout=15.0):
+        context = multiprocessing.get_context('spawn')
+        # Room for the current area at full size; a larger area needs a restart.
+        slot_bytes = max(1, self.area['width'] * self.area['height'] * 3)
+        self.ring = FrameRing.create(self.slots, slot_bytes)
+        self.results, result_sender = context.Pipe(duplex=False)
+        command_receiver, self.commands = context.Pipe(duplex=False)
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=run_vision_worker,
+            args=(self.area, self.use_party_hp_bar, self.skip_unchanged, self.capture, self.interval,
+                  self.ring.name, self.slots, slot_bytes, result_sender, command_receiver, self.stop_event,
+                  logging.getLogger().getEffectiveLevel(), self.colour_ranges, self.geometry),
+            name="VisionWorker",
+            daemon=True
+        )
+        self.process.start()
+        result_sender.close()
+        command_receiver.close()
+
+        message = self.results.recv() if self.results.poll(timeout) else ('error', 'timed out')
+        if message[0] != 'ready':
+            self.stop()
+            raise RuntimeError(f"Vision worker failed to start: {message[1]}")
+        logging.info(f"Vision worker started (pid {self.process.pid}).")
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def receive(self, timeout=1.0):
+        # Returns the newest sample; older ones queued behind a slow consumer are dropped.
+        sample = None
+        try:
+            if not self.results.poll(timeout):
+                return None
+            while True:
+                message = self.results.recv()
+                if message[0] == 'sample':
+                    sample = message[1]
+                if not self.results.poll():
+                    break
+        except (EOFError, OSError):
+            pass
+        return sample
+
+    def send(self, name, value):
+        try:
+            self.commands.send((name, value))
+        except (BrokenPipeError, OSError) as e:
+            logging.warning(f"Unable to send {name} to vision worker: {e}")
+
+    def frame_ref(self, sample):
+        return SharedFrameRef(self.ring, sample.slot, sample.sequence)
+
+    def stop(self, timeout=2.0):
+        if self.stop_event is not None:
+            self.stop_event.set()
+        if self.process is not None:
+            # Keep draining results so a worker blocked on a full pipe can see the stop event.
+            deadline = time.perf_counter() + timeout
+            while self.process.is_alive() and time.perf_counter() < deadline:
+                try:
+                    while self.results.poll():
+                        self.results.recv()
+                except (EOFError, OSError):
+                    pass
+                self.process.join(0.05)
+            if self.process.is_alive():
+                logging.warning("Vision worker did not exit in time; terminating.")
+                self.process.terminate()
+                self.process.join(timeout)
+            self.process = None
+        for connection in (self.results, self.commands):
+            if connection is not None:
+                connection.close()
+        self.results = self.commands = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+        logging.info("Vision worker stopped.")
@@ -0,0 +1,193 @@
+import sys
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+
+class WindowProvider(ABC):
+    @abstractmethod
+    def foreground_window(self):
+        pass
+
+    @abstractmethod
+    def window_title(self, hwnd):
+        pass
+
+
+class Win32WindowProvider(WindowProvider):
+    def __init__(self):
+        import win32gui
+        self.win32gui = win32gui
+
+    def foreground_window(self):
+        return self.win32gui.GetForegroundWindow()
+
+    def window_title(self, hwnd):
+        return self.win32gui.GetWindowText(hwnd)
+
+
+class WindowFocusWatcher(ABC):
+    max_cached_windows = 256
+
+    def __init__(self, title_substring, provider):
+        self.title_substring = title_substring
+        self.provider = provider
+        self.listeners = []
+        self.match_cache = {}
+        self.current_window = None
+        self.is_active = False
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback):
+        self.listeners.append(callback)
+
+    def matches(self, hwnd):
+        # Titles are only read the first time a window handle comes to the foreground.
+        match = self.match_cache.get(hwnd)
+        if match is None:
+            if len(self.match_cache) >= self.max_cached_windows:
+                self.match_cache.clear()
+            try:
+                match = self.title_substring in self.provider.window_title(hwnd)
+            except Exception as e:
+                logging.debug(f"Unable to read window title for {hwnd}: {e}")
+                return False
+            self.match_cache[hwnd] = match
+        return match
+
+    def handle_foreground(self, hwnd):
+        with self.lock:
+            if hwnd == self.current_window:
+                return
+            self.current_window = hwnd
+            active = bool(hwnd) and self.matches(hwnd)
+            if active == self.is_active:
+                return
+            self.is_active = active
+        logging.info(f"Target window {'activated' if active else 'deactivated'}.")
+        for callback in self.listeners:
+            try:
+                callback(active)
+            except Exception as e:
+                logging.error(f"Error in window focus callback: {e}")
+
+    def refresh(self):
+        self.handle_foreground(self.provider.foreground_window())
+
+    @abstractmethod
+    def start(self):
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
+
+
+class PollingWindowWatcher(WindowFocusWatcher):
+    def __init__(self, title_substring, provider, poll_interval=0.25):
+        super().__init__(title_substring, provider)
+        self.poll_interval = poll_interval
+        self.stop_requested = threading.Event()
+        self.poll_thread = None
+
+    def start(self):
+        if self.poll_thread and self.poll_thread.is_alive():
+            return
+        self.refresh()
+        self.stop_requested.clear()
+        self.poll_thread = threading.Thread(target=self.poll, name="WindowWatcher")
+        self.poll_thread.daemon = True
+        self.poll_thread.start()
+
+    def poll(self):
+        while not self.stop_requested.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Error polling foreground window: {e}")
+
+    def stop(self):
+        self.stop_requested.set()
+        if self.poll_thread and self.poll_thread.is_alive():
+            self.poll_thread.join(timeout=1.0)
+        self.poll_thread = None
+
+
+class HookWindowWatcher(WindowFocusWatcher):
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WM_QUIT = 0x0012
+
+    def __init__(self, title_substring, provider):
+        super().__init__(title_substring, provider)
+        import ctypes
+        from ctypes import wintypes
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.windll.user32
+        self.hook_thread = None
+        self.hook_thread_id = None
+        self.ready = threading.Event()
+        self.hook_failed = False
+        WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+                                          wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        # Keep a reference so the callback is not garbage collected while hooked.
+        self.callback = WinEventProc(self.on_win_event)
+
+    def on_win_event(self, hook, event, hwnd, id_object, id_child, event_thread, event_time):
+        self.handle_foreground(hwnd)
+
+    def start(self):
+        if self.hook_thread and self.hook_thread.is_alive():
+            return
+        self.refresh()
+        self.ready.clear()
+        self.hook_thread = threading.Thread(target=self.run_hook, name="WindowHook")
+        self.hook_thread.daemon = True
+        self.hook_thread.start()
+        self.ready.wait(timeout=2.0)
+        if self.hook_failed:
+            raise OSError("SetWinEventHook failed")
+
+    def run_hook(self):
+        self.hook_thread_id = self.ctypes.windll.kernel32.GetCurrentThreadId()
+        hook = self.user32.SetWinEventHook(self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND, 0,
+                                           self.callback, 0, 0, self.WINEVENT_OUTOFCONTEXT)
+        if not hook:
+            self.hook_failed = True
+            self.ready.set()
+            return
+        self.ready.set()
+        msg = self.wintypes.MSG()
+        try:
+            while self.user32.GetMessageW(self.ctypes.byref(msg), 0, 0, 0) > 0:
+                self.user32.TranslateMessage(self.ctypes.byref(msg))
+                self.user32.DispatchMessageW(self.ctypes.byref(msg))
+        finally:
+            self.user32.UnhookWinEvent(hook)
+
+    def stop(self):
+        if self.hook_thread and self.hook_thread.is_alive():
+            self.user32.PostThreadMessageW(self.hook_thread_id, self.WM_QUIT, 0, 0)
+            self.hook_thread.join(timeout=1.0)
+        self.hook_thread = None
+
+
+def create_window_watcher(title_substring, callback=None, provider=None, poll_interval=0.25):
+    if provider is None and sys.platform == 'win32':
+        try:
+            watcher = HookWindowWatcher(title_substring, Win32WindowProvider())
+            if callback:
+                watcher.subscribe(callback)
+            watcher.start()
+            logging.info("Using foreground window hook.")
+            return watcher
+        except Exception as e:
+            logging.warning(f"Foreground window hook unavailable, falling back to polling: {e}")
+    if provider is None:
+        provider = Win32WindowProvider()
+    watcher = PollingWindowWatcher(title_substring, provider, poll_interval)
+    if callback:
+        watcher.subscribe(callback)
+    watcher.start()
+    return watcher